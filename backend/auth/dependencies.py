@@ -1,3 +1,8 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -9,6 +14,12 @@ from database import db
 
 security = HTTPBearer()
 
+# Verified tokens are trusted for a few minutes before the user is looked up again
+AUTH_CACHE_TTL = 5 * 60
+AUTH_CACHE_MAXSIZE = 8192
+_verified_users: OrderedDict = OrderedDict()
+_verified_users_lock = threading.Lock()
+
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token."""
@@ -32,6 +43,39 @@ def verify_token(token: str) -> Optional[dict]:
         return None
 
 
+def _token_key(token: str) -> str:
+    """Digest of a token, so raw tokens are not held in memory as cache keys."""
+    return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+def get_cached_user(token: str) -> Optional[dict]:
+    """Return the user for a recently verified token, or None."""
+    key = _token_key(token)
+    with _verified_users_lock:
+        entry = _verified_users.get(key)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if expires_at <= time.time():
+            del _verified_users[key]
+            return None
+        _verified_users.move_to_end(key)
+        return user
+
+
+def cache_verified_user(token: str, user: dict, token_exp: Optional[float]):
+    """Remember a verified token until AUTH_CACHE_TTL elapses or the token expires."""
+    expires_at = time.time() + AUTH_CACHE_TTL
+    if token_exp is not None:
+        expires_at = min(expires_at, float(token_exp))
+    key = _token_key(token)
+    with _verified_users_lock:
+        _verified_users[key] = (user, expires_at)
+        _verified_users.move_to_end(key)
+        while len(_verified_users) > AUTH_CACHE_MAXSIZE:
+            _verified_users.popitem(last=False)
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Dependency to get current authenticated user."""
     credentials_exception = HTTPException(
@@ -41,6 +85,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
 
     token = credentials.credentials
+    cached_user = get_cached_user(token)
+    if cached_user is not None:
+        return dict(cached_user)
+
     payload = verify_token(token)
 
     if payload is None:
@@ -52,9 +100,11 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if user_id is None or email is None:
         raise credentials_exception
 
-    # Verify user exists in database
-    user = db.get_user_by_id(user_id)
+    # Verify user exists in database (blocking Supabase call, kept off the event loop)
+    user = await asyncio.to_thread(db.get_user_by_id, user_id)
     if user is None:
         raise credentials_exception
 
-    return {"user_id": user_id, "email": email}
\ No newline at end of file
+    current_user = {"user_id": user_id, "email": email}
+    cache_verified_user(token, current_user, payload.get("exp"))
+    return dict(current_user)
\ No newline at end of file
@@ -0,0 +1,194 @@
+import copy
+import functools
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from config.config import Config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Time-to-live for cached responses (seconds)
+WEATHER_TTL = 10 * 60
+GEOCODE_TTL = 30 * 24 * 60 * 60
+GEOCODE_MISS_TTL = 24 * 60 * 60
+HISTORICAL_TTL = 24 * 60 * 60
+FORECAST_TTL = 24 * 60 * 60
+
+
+class ResponseCache:
+    def __init__(self, redis_url: str = None, prefix: str = 'landcare:', max_local_entries: int = 4096):
+        """Response cache backed by Redis when configured, otherwise by a bounded in-process LRU."""
+        self.prefix = prefix
+        self.client = None
+        self.max_local_entries = max_local_entries
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+        if redis_url and redis is not None:
+            try:
+                self.client = redis.Redis.from_url(redis_url)
+                self.client.ping()
+            except Exception as e:
+                print(f"Warning: Redis unavailable ({e}). Falling back to in-process cache.")
+                self.client = None
+
+    def get(self, key: str):
+        """Return the cached value for key, or None if missing or expired."""
+        try:
+            if self.client is not None:
+                raw = self.client.get(self.prefix + key)
+            else:
+                with self._lock:
+                    entry = self._local.get(key)
+                    if entry is None:
+                        return None
+                    raw, expires_at = entry
+                    if expires_at < time.time():
+                        del self._local[key]
+                        return None
+                    self._local.move_to_end(key)
+            return json.loads(raw) if raw is not None else None
+        except Exception as e:
+            print(f"Response cache read error: {e}")
+            return None
+
+    def set(self, key: str, value, ttl: int):
+        """Store a JSON-serializable value for ttl seconds."""
+        try:
+            raw = json.dumps(value)
+            if self.client is not None:
+                self.client.setex(self.prefix + key, ttl, raw)
+            else:
+                with self._lock:
+                    self._local[key] = (raw, time.time() + ttl)
+                    self._local.move_to_end(key)
+                    # Evict least recently used entries beyond the bound
+                    while len(self._local) > self.max_local_entries:
+                        self._local.popitem(last=False)
+        except Exception as e:
+            print(f"Response cache write error: {e}")
+
+    def incr(self, key: str):
+        """Increment a shared counter. Only supported with Redis; a no-op otherwise."""
+        try:
+            if self.client is not None:
+                return self.client.incr(self.prefix + key)
+        except Exception as e:
+            print(f"Response cache incr error: {e}")
+        return None
+
+    def get_counters(self, keys: list):
+        """Read shared counters in one round-trip, or None without Redis.
+
+        In-process counters would differ between workers, so callers must not
+        treat them as a global version.
+        """
+        try:
+            if self.client is not None:
+                return [int(value or 0) for value in self.client.mget([self.prefix + key for key in keys])]
+        except Exception as e:
+            print(f"Response cache read error: {e}")
+        return None
+
+    def delete(self, key: str):
+        """Remove a cached value."""
+        try:
+            if self.client is not None:
+                self.client.delete(self.prefix + key)
+            else:
+                with self._lock:
+                    self._local.pop(key, None)
+        except Exception as e:
+            print(f"Response cache delete error: {e}")
+
+
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the values that identify a response version."""
+    digest = hashlib.blake2b(
+        json.dumps(parts, sort_keys=True, default=str).encode(),
+        digest_size=16
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+def etag_headers(etag: str, max_age: int = 600) -> dict:
+    """Response headers for a private, revalidatable ETag."""
+    return {'ETag': etag, 'Cache-Control': f'private, max-age={max_age}'}
+
+
+def coordinate_key(prefix: str, lat: float, lon: float) -> str:
+    """Build a cache key from a coordinate pair rounded to 3 decimals (~100 m)."""
+    return f"{prefix}:{round(lat, 3)}:{round(lon, 3)}"
+
+
+HISTORY_SECTIONS = ('analyses', 'historical', 'forecasts')
+
+
+def bump_history_version(user_id: str, section: str):
+    """Record that a user's saved history changed, invalidating /history ETags."""
+    response_cache.incr(f"history:v:{user_id}:{section}")
+
+
+def history_versions(user_id: str):
+    """Current history version per section for a user, or None if versions aren't shared."""
+    return response_cache.get_counters([f"history:v:{user_id}:{section}" for section in HISTORY_SECTIONS])
+
+
+def single_flight(func):
+    """Decorator that coalesces concurrent identical calls.
+
+    The first caller for a given set of arguments runs the function; callers arriving
+    while it is in flight wait for the same result instead of repeating the work. Nothing
+    is kept once the call finishes, so repeat requests are served by response_cache.
+    Waiters receive a deep copy, so mutating a result never affects another caller.
+    """
+    in_flight = {}
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        key = hashlib.blake2b(
+            json.dumps([args, kwargs], sort_keys=True, default=str).encode(),
+            digest_size=16
+        ).hexdigest()
+
+        with lock:
+            future = in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                in_flight[key] = future
+
+        if not owner:
+            return copy.deepcopy(future.result())
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with lock:
+                in_flight.pop(key, None)
+        future.set_result(result)
+        return result
+
+    return wrapper
+
+
+# Global response cache instance
+response_cache = ResponseCache(Config.REDIS_URL)
@@ -16,3 +16,6 @@ class Config:
 
     # Geocoding
     LOCATIONIQ_API_KEY = os.getenv('LOCATIONIQ_API_KEY')
+
+    # Redis (optional, used for response caching)
+    REDIS_URL = os.getenv('REDIS_URL')
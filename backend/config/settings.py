@@ -3,7 +3,7 @@ from pydantic import Field
 from dotenv import load_dotenv
 
 load_dotenv()
-from typing import List
+from typing import List, Optional
 import secrets
 
 
@@ -12,6 +12,12 @@ class Settings(BaseSettings):
     debug: bool = Field(default=False, env="DEBUG")
     secret_key: str = Field(default_factory=lambda: secrets.token_hex(32), env="SECRET_KEY")
 
+    # Server
+    web_concurrency: int = Field(default=1, env="WEB_CONCURRENCY")
+    max_content_length: int = Field(default=1024 * 1024, env="MAX_CONTENT_LENGTH")
+    # Bearer token for /metrics; the endpoint is not mounted when unset
+    metrics_token: Optional[str] = Field(default=None, env="METRICS_TOKEN")
+
     # CORS
     cors_origins: List[str] = Field(default=["http://localhost:3000", "http://localhost:5000", "https://landcare-ai-frontend.onrender.com", "https://land-care-ai-dl98.vercel.app"], env="CORS_ORIGINS")
 
@@ -1,6 +1,7 @@
 from supabase import create_client, Client
 from config.config import Config
 import json
+import orjson
 from datetime import datetime, timedelta
 import hashlib
 import pickle
@@ -8,8 +9,8 @@ import base64
 import jwt
 import bcrypt
 from functools import wraps
-import pandas as pd
 import numpy as np
+from cache import bump_history_version
 
 class Database:
     def __init__(self):
@@ -54,15 +55,17 @@ class Database:
                 'weather': json.dumps(results.get('weather', {})),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_analyses').insert(data).execute()
+            result = self.client.table('landcare_analyses').insert(data).execute()
+            bump_history_version(user_id, 'analyses')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
 
-    def get_user_analyses(self, user_id: str, limit: int = 10):
-        """Get user's analysis history."""
+    def get_user_analyses(self, user_id: str, limit: int = 10, offset: int = 0, columns: str = '*'):
+        """Get a page of the user's analysis history, newest first."""
         try:
-            return self.client.table('landcare_analyses').select('*').eq('user_id', user_id).order('created_at', desc=True).limit(limit).execute()
+            return self.client.table('landcare_analyses').select(columns).eq('user_id', user_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -157,7 +160,9 @@ class Database:
                 }),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_historical_data').insert(data).execute()
+            result = self.client.table('landcare_historical_data').insert(data).execute()
+            bump_history_version(user_id, 'historical')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -173,7 +178,9 @@ class Database:
                 'values': json.dumps(historical_data.get('evi_values', [])),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_historical_data').insert(data).execute()
+            result = self.client.table('landcare_historical_data').insert(data).execute()
+            bump_history_version(user_id, 'historical')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -189,7 +196,9 @@ class Database:
                 'values': json.dumps(historical_data.get('savi_values', [])),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_historical_data').insert(data).execute()
+            result = self.client.table('landcare_historical_data').insert(data).execute()
+            bump_history_version(user_id, 'historical')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -226,15 +235,17 @@ class Database:
                 }),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_historical_data').insert(data).execute()
+            result = self.client.table('landcare_historical_data').insert(data).execute()
+            bump_history_version(user_id, 'historical')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
 
-    def get_historical_data(self, user_id: str, data_type: str, limit: int = 5):
-        """Get user's historical data."""
+    def get_historical_data(self, user_id: str, data_type: str, limit: int = 5, offset: int = 0, columns: str = '*'):
+        """Get a page of the user's historical data, newest first."""
         try:
-            return self.client.table('landcare_historical_data').select('*').eq('user_id', user_id).eq('data_type', data_type).order('created_at', desc=True).limit(limit).execute()
+            return self.client.table('landcare_historical_data').select(columns).eq('user_id', user_id).eq('data_type', data_type).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -253,15 +264,17 @@ class Database:
                 'run_date': datetime.utcnow().isoformat(),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_forecasts').insert(data).execute()
+            result = self.client.table('landcare_forecasts').insert(data).execute()
+            bump_history_version(user_id, 'forecasts')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
 
-    def get_forecasts(self, user_id: str, limit: int = 5):
-        """Get user's forecast history."""
+    def get_forecasts(self, user_id: str, limit: int = 5, offset: int = 0, columns: str = '*'):
+        """Get a page of the user's forecast history, newest first."""
         try:
-            return self.client.table('landcare_forecasts').select('*').eq('user_id', user_id).order('created_at', desc=True).limit(limit).execute()
+            return self.client.table('landcare_forecasts').select(columns).eq('user_id', user_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -364,7 +377,32 @@ class Database:
                 'forecast_data': json.dumps(forecast_data),
                 'created_at': datetime.utcnow().isoformat()
             }
-            return self.client.table('landcare_forecasts').insert(data).execute()
+            result = self.client.table('landcare_forecasts').insert(data).execute()
+            bump_history_version(user_id, 'forecasts')
+            return result
+        except Exception as e:
+            print(f"Database error: {e}")
+            return None
+
+    def save_forecasts_bulk(self, forecasts: list):
+        """Save several (user_id, geometry, forecast_data) forecasts in a single insert."""
+        if not forecasts:
+            return None
+        try:
+            created_at = datetime.utcnow().isoformat()
+            rows = [
+                {
+                    'user_id': user_id,
+                    'geometry': json.dumps(geometry),
+                    'forecast_data': json.dumps(forecast_data),
+                    'created_at': created_at
+                }
+                for user_id, geometry, forecast_data in forecasts
+            ]
+            result = self.client.table('landcare_forecasts').insert(rows).execute()
+            for user_id in {user_id for user_id, _, _ in forecasts}:
+                bump_history_version(user_id, 'forecasts')
+            return result
         except Exception as e:
             print(f"Database error: {e}")
             return None
@@ -390,8 +428,9 @@ class Database:
 
     def generate_geometry_hash(self, geometry: dict) -> str:
         """Generate a hash for geometry to use as cache key."""
-        geometry_str = json.dumps(geometry, sort_keys=True)
-        return hashlib.md5(geometry_str.encode()).hexdigest()
+        # Canonical compact JSON (sorted keys) encoded in C, hashed with blake2b
+        geometry_bytes = orjson.dumps(geometry, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(geometry_bytes, digest_size=16).hexdigest()
 
 # Utility functions for data processing
 def calculate_statistics(values):
@@ -437,6 +476,8 @@ def normalize_vegetation_data(values):
 
 def aggregate_weather_data(dates, temperatures, rainfall):
     """Aggregate daily weather data to monthly summaries."""
+    import pandas as pd
+
     try:
         if not dates or not temperatures or not rainfall:
             return {'dates': [], 'avg_temperature': [], 'total_rainfall': []}
@@ -0,0 +1,66 @@
+import atexit
+import threading
+from typing import Any, Dict
+
+from database import db
+from metrics import stage_timer
+
+# Forecast rows are flushed in one insert once this many are queued, or after FLUSH_INTERVAL seconds
+FLUSH_SIZE = 50
+FLUSH_INTERVAL = 2.0
+
+
+class ForecastWriter:
+    def __init__(self, flush_size: int = FLUSH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        """Buffer forecast saves and persist them with db.save_forecasts_bulk.
+
+        The queue lives in process memory: rows still queued when the process is killed
+        or crashes (anything short of a clean interpreter exit) are lost, which is at
+        most flush_interval seconds or flush_size rows of forecasts.
+        """
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def add(self, user_id: str, geometry: Dict[str, Any], forecast_data: Dict[str, Any]):
+        """Queue a forecast for the next bulk insert."""
+        with self._lock:
+            self._pending.append((user_id, geometry, forecast_data))
+            full = len(self._pending) >= self.flush_size
+            if self._thread is None:
+                # Started lazily so importing this module never spawns a thread
+                self._thread = threading.Thread(target=self._run, name='forecast-writer', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all queued forecasts in one insert."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        with stage_timer('forecast_writer', 'db_save'):
+            if db.save_forecasts_bulk(pending) is not None:
+                return
+            # The bulk insert failed as a whole; retry row by row so one bad row doesn't lose the batch
+            for user_id, geometry, forecast_data in pending:
+                if db.save_forecast(user_id, geometry, forecast_data) is None:
+                    print(f"Forecast save failed for user {user_id}; forecast dropped")
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Forecast bulk save error: {e}")
+
+
+# Global forecast writer instance; queued rows are written on interpreter shutdown
+forecast_writer = ForecastWriter()
+atexit.register(forecast_writer.flush)
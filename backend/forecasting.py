@@ -5,8 +5,60 @@ from sklearn.metrics import mean_squared_error
 import warnings
 import hashlib
 import asyncio
+import threading
+from collections import OrderedDict
 warnings.filterwarnings("ignore")
 
+# Recently fitted models kept in process, in front of the database model cache
+MODEL_CACHE_SIZE = 64
+_fitted_models = OrderedDict()
+_fitted_models_lock = threading.Lock()
+
+
+def get_cached_model(model_key):
+    """Return a cached {'model', 'model_info'} entry from process memory, then the database."""
+    with _fitted_models_lock:
+        entry = _fitted_models.get(model_key)
+        if entry is not None:
+            _fitted_models.move_to_end(model_key)
+            return entry
+
+    from database import db
+    cached_model = db.get_cached_arima_model(model_key)
+    if cached_model:
+        remember_model(model_key, cached_model['model'], cached_model['model_info'])
+    return cached_model
+
+
+def remember_model(model_key, model_fit, model_info):
+    """Keep a fitted model in the in-process LRU."""
+    with _fitted_models_lock:
+        _fitted_models[model_key] = {'model': model_fit, 'model_info': model_info}
+        _fitted_models.move_to_end(model_key)
+        while len(_fitted_models) > MODEL_CACHE_SIZE:
+            _fitted_models.popitem(last=False)
+
+
+def cache_model(model_key, model_fit, model_info):
+    """Store a freshly fitted model in process memory and in the database model cache."""
+    remember_model(model_key, model_fit, model_info)
+    from database import db
+    db.save_cached_arima_model(model_key, model_fit, model_info)
+
+
+def series_from_history(dates, values):
+    """Build a clean, date-indexed float series from parallel date/value sequences.
+
+    Dates may be strings or datetime64 values; missing, 'nan' and non-numeric values
+    (and unparseable dates) are dropped in one vectorized pass.
+    """
+    n = min(len(dates), len(values))
+    series = pd.Series(
+        pd.to_numeric(pd.Series(list(values[:n]), dtype=object), errors='coerce').to_numpy(dtype=np.float64),
+        index=pd.to_datetime(pd.Series(list(dates[:n])), errors='coerce')
+    )
+    return series[series.index.notna() & series.notna().to_numpy()]
+
 def forecast_ndvi(historical_ndvi, periods=12, geometry_hash=None, use_sarima=False):
     """
     Forecast NDVI using ARIMA/SARIMA model with caching and confidence intervals.
@@ -16,20 +68,11 @@ def forecast_ndvi(historical_ndvi, periods=12, geometry_hash=None, use_sarima=Fa
     use_sarima: whether to use SARIMA instead of ARIMA
     """
     try:
-        # Filter out invalid values
-        valid_data = [(d, v) for d, v in zip(historical_ndvi['dates'], historical_ndvi['values']) if v is not None and str(v).lower() != 'nan']
-
-        if len(valid_data) == 0:
-            return {'error': 'No valid historical NDVI data available for forecasting'}
-
-        dates, values = zip(*valid_data)
-        dates = pd.to_datetime(dates)
-        values = pd.Series(values, index=dates)
-
-        # Ensure numeric and clean
-        values = pd.to_numeric(values, errors='coerce').dropna()
+        # Parse dates once and drop invalid values
+        values = series_from_history(historical_ndvi['dates'], historical_ndvi['values'])
         if len(values) == 0:
             return {'error': 'No valid historical NDVI data available for forecasting'}
+        dates = values.index
 
         # Generate model key for caching
         model_key = None
@@ -41,8 +84,7 @@ def forecast_ndvi(historical_ndvi, periods=12, geometry_hash=None, use_sarima=Fa
         # Try to get cached model
         cached_model = None
         if model_key:
-            from database import db
-            cached_model = db.get_cached_arima_model(model_key)
+            cached_model = get_cached_model(model_key)
 
         if cached_model:
             # Use cached model
@@ -73,7 +115,7 @@ def forecast_ndvi(historical_ndvi, periods=12, geometry_hash=None, use_sarima=Fa
 
             # Cache the model
             if model_key:
-                db.save_cached_arima_model(model_key, model_fit, model_info)
+                cache_model(model_key, model_fit, model_info)
 
         # Forecast with confidence intervals
         forecast_result = model_fit.get_forecast(steps=periods)
@@ -109,20 +151,11 @@ def forecast_weather(historical_weather, variable='temperature', periods=12, loc
         if variable == 'precipitation':
             variable = 'rainfall'
 
-        # Filter out invalid values
-        valid_data = [(d, v) for d, v in zip(historical_weather['dates'], historical_weather[variable]) if v is not None and str(v).lower() != 'nan']
-
-        if len(valid_data) == 0:
-            return {'error': f'No valid historical {variable} data available for forecasting'}
-
-        dates, values = zip(*valid_data)
-        dates = pd.to_datetime(dates)
-        values = pd.Series(values, index=dates)
-
-        # Ensure numeric and clean
-        values = pd.to_numeric(values, errors='coerce').dropna()
+        # Parse dates once and drop invalid values
+        values = series_from_history(historical_weather['dates'], historical_weather[variable])
         if len(values) == 0:
             return {'error': f'No valid historical {variable} data available for forecasting'}
+        dates = values.index
 
         # Generate model key for caching
         model_key = None
@@ -134,8 +167,7 @@ def forecast_weather(historical_weather, variable='temperature', periods=12, loc
         # Try to get cached model
         cached_model = None
         if model_key:
-            from database import db
-            cached_model = db.get_cached_arima_model(model_key)
+            cached_model = get_cached_model(model_key)
 
         if cached_model:
             # Use cached model
@@ -168,7 +200,7 @@ def forecast_weather(historical_weather, variable='temperature', periods=12, loc
 
             # Cache the model
             if model_key:
-                db.save_cached_arima_model(model_key, model_fit, model_info)
+                cache_model(model_key, model_fit, model_info)
 
         # Forecast with confidence intervals
         forecast_result = model_fit.get_forecast(steps=periods)
@@ -190,6 +222,19 @@ def forecast_weather(historical_weather, variable='temperature', periods=12, loc
     except Exception as e:
         return {'error': str(e)}
 
+def calculate_ewma_features(values, halflives=(3, 7, 15)):
+    """
+    Calculate exponentially weighted moving averages for several half-lives.
+    values: list of values (None for missing observations)
+    halflives: half-lives in time steps (months for VI series)
+    """
+    series = pd.Series(values, dtype=float)
+    features = {}
+    for halflife in halflives:
+        ewma = series.ewm(halflife=halflife, adjust=False).mean().to_numpy()
+        features[f'halflife_{halflife}'] = np.where(np.isnan(ewma), None, np.round(ewma, 4)).tolist()
+    return features
+
 def calculate_statistics(data):
     """
     Calculate statistical metrics for time series data.
@@ -1,10 +1,26 @@
 import ee
-import geemap
 from config.config import Config
+from cache import single_flight
 import datetime
+import threading
 import numpy as np
 
+# Earth Engine only needs to be initialized once per process; re-initializing
+# discards the client (and its pooled connections) built by the previous call.
+_gee_initialized = False
+_gee_init_lock = threading.Lock()
+
 def initialize_gee():
+    """Initialize Google Earth Engine once per process and return whether it is available."""
+    global _gee_initialized
+    if _gee_initialized:
+        return True
+    with _gee_init_lock:
+        if not _gee_initialized:
+            _gee_initialized = _authenticate_gee()
+        return _gee_initialized
+
+def _authenticate_gee():
     """Initialize Google Earth Engine with prioritized authentication based on environment.
 
     For production/cloud environments (Render, headless servers):
@@ -125,11 +141,20 @@ def initialize_gee():
     print("[FAILED] All GEE authentication methods failed. Check credentials and network connectivity.")
     return False
 
+def as_roi(geometry):
+    """Build an ee.Geometry polygon from a GeoJSON dict, passing an existing ee.Geometry through.
+
+    Callers fanning one polygon out to several helpers can build it once and pass it to each.
+    """
+    if isinstance(geometry, ee.Geometry):
+        return geometry
+    return ee.Geometry.Polygon(geometry['coordinates'])
+
 def get_ndvi(geometry):
-    """Calculate NDVI for given geometry."""
+    """Calculate NDVI for given geometry (GeoJSON dict or ee.Geometry)."""
     try:
         # Define the region of interest
-        roi = ee.Geometry.Polygon(geometry['coordinates'])
+        roi = as_roi(geometry)
 
         # Get Sentinel-2 image collection
         collection = ee.ImageCollection('COPERNICUS/S2_SR') \
@@ -167,10 +192,10 @@ def get_ndvi(geometry):
         }
 
 def get_evi(geometry):
-    """Calculate EVI (Enhanced Vegetation Index) for given geometry."""
+    """Calculate EVI (Enhanced Vegetation Index) for given geometry (GeoJSON dict or ee.Geometry)."""
     try:
         # Define the region of interest
-        roi = ee.Geometry.Polygon(geometry['coordinates'])
+        roi = as_roi(geometry)
 
         # Get Sentinel-2 image collection
         collection = ee.ImageCollection('COPERNICUS/S2_SR') \
@@ -219,10 +244,10 @@ def get_evi(geometry):
         }
 
 def get_savi(geometry, L=0.5):
-    """Calculate SAVI (Soil-Adjusted Vegetation Index) for given geometry."""
+    """Calculate SAVI (Soil-Adjusted Vegetation Index) for given geometry (GeoJSON dict or ee.Geometry)."""
     try:
         # Define the region of interest
-        roi = ee.Geometry.Polygon(geometry['coordinates'])
+        roi = as_roi(geometry)
 
         # Get Sentinel-2 image collection
         collection = ee.ImageCollection('COPERNICUS/S2_SR') \
@@ -269,6 +294,65 @@ def get_savi(geometry, L=0.5):
             'source_details': 'Fallback mock data'
         }
 
+def get_vis_bundle(geometry, L=0.5):
+    """Calculate NDVI, EVI and SAVI for given geometry in a single reduceRegion round-trip.
+
+    Returns {'ndvi': ..., 'evi': ..., 'savi': ...} shaped like the get_ndvi/get_evi/get_savi results.
+    """
+    try:
+        # Define the region of interest
+        roi = as_roi(geometry)
+
+        # Same Sentinel-2 selection as the per-index helpers
+        collection = ee.ImageCollection('COPERNICUS/S2_SR') \
+            .filterBounds(roi) \
+            .filterDate('2023-01-01', '2024-01-01') \
+            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)) \
+            .sort('system:time_start', False)
+
+        # Get the most recent image
+        image = collection.first()
+        bands = {
+            'NIR': image.select('B8'),
+            'RED': image.select('B4'),
+            'BLUE': image.select('B2'),
+            'L': L
+        }
+
+        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+        evi = image.expression('2.5 * ((NIR - RED) / (NIR + 6 * RED - 7.5 * BLUE + 1))', bands).rename('EVI')
+        savi = image.expression('((NIR - RED) / (NIR + RED + L)) * (1 + L)', bands).rename('SAVI')
+
+        # One reduction over the three bands instead of three separate requests
+        stats = ndvi.addBands([evi, savi]).reduceRegion(
+            reducer=ee.Reducer.mean(),
+            geometry=roi,
+            scale=10,
+            maxPixels=1e9
+        ).getInfo()
+
+        return {
+            key: {
+                band: stats.get(band),
+                'data_source': 'satellite',
+                'source_details': 'Google Earth Engine Sentinel-2'
+            }
+            for key, band in (('ndvi', 'NDVI'), ('evi', 'EVI'), ('savi', 'SAVI'))
+        }
+    except Exception as e:
+        # Return mock data on error
+        return {
+            key: {
+                band: value,
+                'error': str(e),
+                'note': 'Mock data due to error',
+                'data_source': 'mock',
+                'source_details': 'Fallback mock data'
+            }
+            for key, band, value in (('ndvi', 'NDVI', 0.65), ('evi', 'EVI', 0.45), ('savi', 'SAVI', 0.55))
+        }
+
+@single_flight
 def get_historical_ndvi(geometry, start_date='1984-01-01', end_date=None):
     """Get historical NDVI data using Landsat Level 2 with monthly averages."""
     try:
@@ -411,6 +495,7 @@ def get_historical_ndvi(geometry, start_date='1984-01-01', end_date=None):
             'source_details': 'Fallback mock data'
         }
 
+@single_flight
 def get_historical_evi(geometry, start_date='1984-01-01', end_date=None):
     """Get historical EVI data using Landsat Level 2 with monthly averages."""
     try:
@@ -559,6 +644,7 @@ def get_historical_evi(geometry, start_date='1984-01-01', end_date=None):
             'source_details': 'Fallback mock data'
         }
 
+@single_flight
 def get_historical_savi(geometry, start_date='1984-01-01', end_date=None, L=0.5):
     """Get historical SAVI data using Landsat Level 2 with monthly averages."""
     try:
@@ -707,9 +793,9 @@ def get_historical_savi(geometry, start_date='1984-01-01', end_date=None, L=0.5)
         }
 
 def get_land_cover(geometry):
-    """Get land cover classification for given geometry."""
+    """Get land cover classification for given geometry (GeoJSON dict or ee.Geometry)."""
     try:
-        roi = ee.Geometry.Polygon(geometry['coordinates'])
+        roi = as_roi(geometry)
 
         # ESA WorldCover 2021
         landcover = ee.ImageCollection("ESA/WorldCover/v200").first()
@@ -790,7 +876,7 @@ def get_land_cover(geometry):
 def get_slope_data(geometry):
     """Get slope data for erosion risk assessment."""
     try:
-        roi = ee.Geometry.Polygon(geometry['coordinates'])
+        roi = as_roi(geometry)
 
         # Get SRTM elevation data
         elevation = ee.Image('USGS/SRTMGL1_003')
@@ -820,6 +906,35 @@ def get_slope_data(geometry):
             'source_details': 'Fallback mock data'
         }
 
+# Degradation risk weight per ESA WorldCover class code
+LAND_COVER_RISK_WEIGHTS = {
+    '10': 0.1,  # Tree cover - low risk
+    '20': 0.3,  # Shrubland - medium risk
+    '30': 0.5,  # Grassland - medium-high risk
+    '40': 0.4,  # Cropland - medium risk
+    '50': 0.8,  # Built-up - high risk
+    '60': 0.9,  # Bare/sparse vegetation - very high risk
+    '70': 0.2,  # Snow and ice - low risk
+    '80': 0.3,  # Water bodies - low-medium risk
+    '90': 0.4,  # Wetlands - medium risk
+    '95': 0.2,  # Mangroves - low risk
+    '100': 0.6  # Moss and lichen - high risk
+}
+
+def calculate_land_cover_risk(lc_map):
+    """Pixel-count weighted land cover risk from a {class_code: pixel_count} histogram."""
+    if not lc_map:
+        return 0
+    counts = np.fromiter(lc_map.values(), dtype=float, count=len(lc_map))
+    total_pixels = counts.sum()
+    if total_pixels <= 0:
+        return 0
+    weights = np.fromiter(
+        (LAND_COVER_RISK_WEIGHTS.get(str(code), 0.5) for code in lc_map),
+        dtype=float, count=len(lc_map)
+    )
+    return float(np.dot(counts, weights) / total_pixels)
+
 def calculate_risk_score(ndvi_data, land_cover_data, slope_data, weather_data, evi_data=None, savi_data=None):
     """Calculate comprehensive risk score for land degradation."""
     try:
@@ -856,30 +971,7 @@ def calculate_risk_score(ndvi_data, land_cover_data, slope_data, weather_data, e
             vegetation_risk = 0.1  # Very low risk
         
         # Land cover risk (based on cover types)
-        lc_map = land_cover_data.get('Map', {})
-        total_pixels = sum(lc_map.values()) if lc_map else 1
-        
-        # Calculate risk based on land cover types
-        risk_weights = {
-            '10': 0.1,  # Tree cover - low risk
-            '20': 0.3,  # Shrubland - medium risk
-            '30': 0.5,  # Grassland - medium-high risk
-            '40': 0.4,  # Cropland - medium risk
-            '50': 0.8,  # Built-up - high risk
-            '60': 0.9,  # Bare/sparse vegetation - very high risk
-            '70': 0.2,  # Snow and ice - low risk
-            '80': 0.3,  # Water bodies - low-medium risk
-            '90': 0.4,  # Wetlands - medium risk
-            '95': 0.2,  # Mangroves - low risk
-            '100': 0.6  # Moss and lichen - high risk
-        }
-        
-        weighted_risk = 0
-        for cover_type, pixel_count in lc_map.items():
-            weight = risk_weights.get(cover_type, 0.5)
-            weighted_risk += (pixel_count / total_pixels) * weight
-        
-        land_cover_risk = weighted_risk
+        land_cover_risk = calculate_land_cover_risk(land_cover_data.get('Map', {}))
         
         # Erosion risk (based on slope)
         slope_mean = slope_data.get('slope_mean', 0)
@@ -962,6 +1054,7 @@ def calculate_risk_score(ndvi_data, land_cover_data, slope_data, weather_data, e
         }
 
 
+@single_flight
 def get_historical_vis(geometry, start_date='1984-01-01', end_date=None):
     """Get historical NDVI, EVI, SAVI data for the specified date range."""
     try:
@@ -1,9 +1,13 @@
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
 
 from config.settings import settings
+from metrics import metrics_app
 from gee_processor import initialize_gee
 
 # Global variable to track GEE initialization
@@ -37,32 +41,79 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=settings.app_name,
     debug=settings.debug,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# CORS policy, built once at import time (origin checks are O(1) set lookups on every request)
+ALLOWED_ORIGINS = frozenset(settings.cors_origins or [])
+CORS_METHODS = ("GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH")
+CORS_HEADERS = (
+    "Authorization",
+    "Content-Type",
+    "X-Requested-With",
+    "Accept",
+    "Accept-Encoding",
+    "Accept-Language",
+    "Cache-Control",
+    "Connection",
+    "Host",
+    "Origin",
+    "Referer",
+    "User-Agent"
+)
+CORS_METHODS_HEADER = ", ".join(CORS_METHODS)
+CORS_HEADERS_HEADER = ", ".join(CORS_HEADERS)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.cors_origins,
+    allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-    allow_headers=[
-        "Authorization",
-        "Content-Type",
-        "X-Requested-With",
-        "Accept",
-        "Accept-Encoding",
-        "Accept-Language",
-        "Cache-Control",
-        "Connection",
-        "Host",
-        "Origin",
-        "Referer",
-        "User-Agent"
-    ],
+    allow_methods=CORS_METHODS,
+    allow_headers=CORS_HEADERS,
 )
 
 
+# Compress JSON responses over 1 KB (historical and forecast time series compress well)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
+
+
+class RequestSizeLimitMiddleware:
+    """Reject request bodies over max_bytes, whether or not the client sends Content-Length."""
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        # Declared oversized bodies are rejected before anything is read
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            response = ORJSONResponse(status_code=413, content={"detail": "Request body too large"})
+            return await response(scope, receive, send)
+
+        # Chunked (or understated) bodies are counted as they stream in
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise HTTPException(status_code=413, detail="Request body too large")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(RequestSizeLimitMiddleware, max_bytes=settings.max_content_length)
+
+
 # Ensure CORS headers are present even when an exception or upstream error occurs
 @app.middleware("http")
 async def ensure_cors_headers(request, call_next):
@@ -75,15 +126,14 @@ async def ensure_cors_headers(request, call_next):
 
     # Add Access-Control-Allow-Origin if missing
     origin = request.headers.get("origin")
-    allowed = settings.cors_origins or []
-    if origin and origin in allowed:
+    if origin and origin in ALLOWED_ORIGINS:
         response.headers.setdefault("Access-Control-Allow-Origin", origin)
     else:
         # Fallback to wildcard only if no specific origin matched
         response.headers.setdefault("Access-Control-Allow-Origin", "*")
 
-    response.headers.setdefault("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS, PATCH")
-    response.headers.setdefault("Access-Control-Allow-Headers", "Authorization, Content-Type, X-Requested-With, Accept, Accept-Encoding, Accept-Language, Cache-Control, Connection, Host, Origin, Referer, User-Agent")
+    response.headers.setdefault("Access-Control-Allow-Methods", CORS_METHODS_HEADER)
+    response.headers.setdefault("Access-Control-Allow-Headers", CORS_HEADERS_HEADER)
     response.headers.setdefault("Access-Control-Allow-Credentials", "true")
 
     return response
@@ -109,6 +159,11 @@ app.include_router(models_router, prefix="/api/models", tags=["Models"])
 app.include_router(tasks_router, tags=["Tasks"])
 app.include_router(utility_router, tags=["Utility"])
 
+# Prometheus metrics (per-endpoint stage timings), only mounted when METRICS_TOKEN is set
+prometheus_app = metrics_app(settings.metrics_token)
+if prometheus_app is not None:
+    app.mount("/metrics", prometheus_app)
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -117,5 +172,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.debug,
+        # Reload mode only supports a single worker process
+        workers=1 if settings.debug else settings.web_concurrency,
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,63 @@
+import functools
+import hmac
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse
+
+try:
+    from prometheus_client import Histogram, make_asgi_app
+except ImportError:
+    Histogram = None
+    make_asgi_app = None
+
+# Per-endpoint, per-stage latency (GEE reductions, upstream weather, risk scoring, DB saves)
+STAGE_SECONDS = Histogram(
+    'landcare_stage_seconds',
+    'Time spent in each stage of a request',
+    ['endpoint', 'stage']
+) if Histogram is not None else None
+
+
+@contextmanager
+def stage_timer(endpoint: str, stage: str):
+    """Record the duration of the enclosed block under (endpoint, stage)."""
+    if STAGE_SECONDS is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(endpoint, stage).observe(time.perf_counter() - start)
+
+
+def timed(endpoint: str, stage: str, func):
+    """Wrap func so each call is recorded under (endpoint, stage)."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage_timer(endpoint, stage):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def metrics_app(token: Optional[str]):
+    """ASGI app serving the Prometheus exposition format to callers presenting the bearer token.
+
+    Returns None (metrics stay unexposed) when no token is configured or prometheus_client is missing.
+    """
+    if not token or make_asgi_app is None:
+        return None
+    prometheus_app = make_asgi_app()
+    expected = f"Bearer {token}".encode()
+
+    async def app(scope, receive, send):
+        authorization = Headers(scope=scope).get("authorization", "").encode()
+        if not hmac.compare_digest(authorization, expected):
+            response = PlainTextResponse("Unauthorized", status_code=401)
+            return await response(scope, receive, send)
+        await prometheus_app(scope, receive, send)
+
+    return app
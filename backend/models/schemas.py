@@ -1,12 +1,22 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+# Upper bound on polygon vertices accepted for GEE processing
+MAX_GEOMETRY_VERTICES = 10000
+
 
 class Geometry(BaseModel):
     type: str = Field(..., example="Polygon")
     coordinates: List[List[List[float]]] = Field(..., description="GeoJSON coordinates")
 
+    @field_validator('coordinates')
+    @classmethod
+    def check_vertex_count(cls, coordinates):
+        if sum(len(ring) for ring in coordinates) > MAX_GEOMETRY_VERTICES:
+            raise ValueError(f'Geometry exceeds {MAX_GEOMETRY_VERTICES} vertices')
+        return coordinates
+
 
 class Centroid(BaseModel):
     lat: float
@@ -117,6 +127,23 @@ class GeocodeResponse(BaseModel):
     boundingbox: List[str]
 
 
+class BatchGeocodeRequest(BaseModel):
+    place_names: List[str] = Field(..., min_length=1, max_length=100)
+
+
+class BatchGeocodeResult(BaseModel):
+    place_name: str
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    display_name: Optional[str] = None
+    boundingbox: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
+class BatchGeocodeResponse(BaseModel):
+    results: List[BatchGeocodeResult]
+
+
 class HistoricalVISRequest(BaseModel):
     geometry: Geometry
     start_date: Optional[str] = None
@@ -128,6 +155,10 @@ class HistoricalData(BaseModel):
     ndvi_values: Optional[List[float]] = None
     evi_values: Optional[List[float]] = None
     savi_values: Optional[List[float]] = None
+    features: Optional[Dict[str, Dict[str, List[Optional[float]]]]] = None
+    ndvi_statistics: Optional[Dict[str, Any]] = None
+    evi_statistics: Optional[Dict[str, Any]] = None
+    savi_statistics: Optional[Dict[str, Any]] = None
     metadata: Optional[Dict[str, Any]] = None
     cached: Optional[bool] = None
     cache_timestamp: Optional[str] = None
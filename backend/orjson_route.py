@@ -0,0 +1,25 @@
+from typing import Any, Callable
+
+import orjson
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+
+
+class ORJSONRequest(Request):
+    async def json(self) -> Any:
+        """Decode the request body with orjson instead of the stdlib json module."""
+        if not hasattr(self, '_json'):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so FastAPI still returns 422
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    def get_route_handler(self) -> Callable:
+        """Route handler that parses JSON bodies (e.g. large polygon geometries) with orjson."""
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await original_route_handler(ORJSONRequest(request.scope, request.receive))
+
+        return route_handler
@@ -1,67 +1,91 @@
 import asyncio
-import math
+import functools
+import numpy as np
 from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, Depends, BackgroundTasks
 from typing import Dict, Any
 
 from models.schemas import AnalysisRequest
 from auth.dependencies import get_current_user
-from gee_processor import get_ndvi, get_evi, get_savi, get_land_cover, get_slope_data, calculate_risk_score
+from gee_processor import as_roi, get_vis_bundle, get_land_cover, get_slope_data, calculate_risk_score
 from weather_integration import get_weather_data
 from database import db
+from metrics import stage_timer, timed
+from orjson_route import ORJSONRoute
 
-router = APIRouter()
+try:
+    from pyproj import Geod
+    _GEOD = Geod(ellps='WGS84')
+except ImportError:
+    _GEOD = None
+
+router = APIRouter(route_class=ORJSONRoute)
+
+# Shared pool for the independent GEE/weather calls issued by /analyze
+# (four calls per request, so this serves several concurrent analyses)
+EXECUTOR = ThreadPoolExecutor(max_workers=32)
+
+# Square meters per square degree at the equator (1 degree ≈ 111,000 meters)
+_AREA_DEG_TO_M2 = 111000.0 * 111000.0
+
+
+def _shoelace(points):
+    """Return (unsigned shoelace area in deg², mean latitude) for an open (N, 2) lon/lat ring."""
+    lon, lat = points[:, 0], points[:, 1]
+    area = abs(np.sum((np.roll(lon, -1) - lon) * (np.roll(lat, -1) + lat))) / 2
+    return area, lat.mean()
 
 
 def calculate_polygon_area(coordinates: list) -> float:
-    """Calculate the area of a polygon using the shoelace formula."""
+    """Calculate the geodesic area of a polygon ring in square meters."""
     if not coordinates or len(coordinates) < 3:
         return 0
 
-    # Convert coordinates to a list of (lon, lat) tuples
-    points = [(coord[0], coord[1]) for coord in coordinates]
+    # Repeat analyses of the same field boundary are served from the cache
+    ring = tuple(tuple(point[:2]) for point in coordinates)
+    return _polygon_area(ring, _GEOD is not None)
+
 
-    # Close the polygon by adding the first point at the end
-    if points[0] != points[-1]:
-        points.append(points[0])
+@functools.lru_cache(maxsize=4096)
+def _polygon_area(ring: tuple, geodesic: bool) -> float:
+    """Area of a hashable (lon, lat) ring; geodesic is part of the key so the fallback is never mixed in."""
+    # (lon, lat) vertex array; drop the closing point if the ring is already closed
+    points = np.ascontiguousarray(np.asarray(ring, dtype=np.float64))
+    if np.array_equal(points[0], points[-1]):
+        points = points[:-1]
 
-    # Shoelace formula
-    area = 0
-    for i in range(len(points) - 1):
-        lon1, lat1 = points[i]
-        lon2, lat2 = points[i + 1]
-        area += (lon2 - lon1) * (lat2 + lat1)
+    if geodesic:
+        # Geodesic area on the WGS84 ellipsoid (sign depends on winding order)
+        area, _ = _GEOD.polygon_area_perimeter(points[:, 0], points[:, 1])
+        return abs(float(area))
 
-    area = abs(area) / 2
+    # Fallback: planar shoelace formula
+    area, mean_lat = _shoelace(points)
 
     # Convert to square meters (approximate for small areas)
-    # Using a simple approximation: 1 degree ≈ 111,000 meters
     # More accurate would be to use proper geodesic calculations
-    area_sq_meters = area * (111000 ** 2) * math.cos(math.radians(sum(lat for _, lat in points[:-1]) / len(points[:-1])))
+    area_sq_meters = area * _AREA_DEG_TO_M2 * np.cos(np.deg2rad(mean_lat))
 
-    return abs(area_sq_meters)
+    return abs(float(area_sq_meters))
 
 
-async def run_gee_operation(operation_func, geometry: Dict[str, Any]) -> Dict[str, Any]:
-    """Run a GEE operation in a thread pool to avoid blocking."""
+async def run_gee_operation(operation_func, geometry: Any) -> Dict[str, Any]:
+    """Run a GEE operation in the shared thread pool to avoid blocking."""
     loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, operation_func, geometry)
-        return result
+    return await loop.run_in_executor(EXECUTOR, operation_func, geometry)
 
 
 async def run_weather_operation(lat: float, lon: float) -> Dict[str, Any]:
-    """Run weather data fetching in a thread pool."""
+    """Run weather data fetching in the shared thread pool."""
     loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_weather_data, lat, lon)
-        return result
+    return await loop.run_in_executor(EXECUTOR, timed('analyze', 'weather', get_weather_data), lat, lon)
 
 
-async def save_analysis_background(user_id: str, geometry: Dict[str, Any], results: Dict[str, Any]):
-    """Background task to save analysis results to database."""
+def save_analysis_background(user_id: str, geometry: Dict[str, Any], results: Dict[str, Any]):
+    """Background task to save analysis results to database (runs in the threadpool after the response)."""
     try:
-        db.save_analysis(user_id, geometry, results)
+        with stage_timer('analyze', 'db_save'):
+            db.save_analysis(user_id, geometry, results)
     except Exception as e:
         print(f"Background save error: {e}")
 
@@ -79,31 +103,39 @@ async def analyze(
 
         results = {}
 
-        # Run GEE operations concurrently
-        gee_tasks = [
-            run_gee_operation(get_ndvi, geometry),
-            run_gee_operation(get_evi, geometry),
-            run_gee_operation(get_savi, geometry),
-            run_gee_operation(get_land_cover, geometry),
-            run_gee_operation(get_slope_data, geometry)
+        # Build the Earth Engine polygon once and share it across the GEE operations
+        try:
+            roi = as_roi(geometry)
+        except Exception:
+            roi = geometry  # each GEE helper falls back to mock data on its own
+
+        # Run GEE operations and the weather lookup concurrently
+        tasks = [
+            run_gee_operation(timed('analyze', 'gee_vis', get_vis_bundle), roi),
+            run_gee_operation(timed('analyze', 'gee_lc', get_land_cover), roi),
+            run_gee_operation(timed('analyze', 'gee_slope', get_slope_data), roi)
         ]
+        if centroid:
+            tasks.append(run_weather_operation(centroid.lat, centroid.lon))
 
-        # Gather all GEE results
-        ndvi_result, evi_result, savi_result, land_cover_result, slope_result = await asyncio.gather(*gee_tasks)
+        # Gather all results; a failing operation is reported in its own section instead of failing the analysis
+        gathered = [
+            {'error': str(result)} if isinstance(result, Exception) else result
+            for result in await asyncio.gather(*tasks, return_exceptions=True)
+        ]
+        vis_result, land_cover_result, slope_result = gathered[:3]
 
-        results['ndvi'] = ndvi_result
-        results['evi'] = evi_result
-        results['savi'] = savi_result
+        # A failed bundle is reported under each index, as the separate calls used to be
+        for key in ('ndvi', 'evi', 'savi'):
+            results[key] = vis_result.get(key, vis_result)
         results['land_cover'] = {
             'land_cover_types': land_cover_result.get('land_cover_types'),
             'land_cover_areas': land_cover_result.get('land_cover_areas')
         }
         results['slope'] = slope_result
 
-        # Get weather data asynchronously if centroid provided
         if centroid:
-            weather_result = await run_weather_operation(centroid.lat, centroid.lon)
-            results['weather'] = weather_result
+            results['weather'] = gathered[3]
 
         # Calculate polygon area synchronously
         if geometry and 'coordinates' in geometry:
@@ -118,14 +150,15 @@ async def analyze(
         # Calculate comprehensive risk score synchronously
         if 'ndvi' in results and 'land_cover' in results:
             try:
-                risk_assessment = calculate_risk_score(
-                    results.get('ndvi', {}),
-                    results.get('land_cover', {}),
-                    results.get('slope', {}),
-                    results.get('weather', {}),
-                    results.get('evi', {}),
-                    results.get('savi', {})
-                )
+                with stage_timer('analyze', 'risk'):
+                    risk_assessment = calculate_risk_score(
+                        results.get('ndvi', {}),
+                        land_cover_result,
+                        results.get('slope', {}),
+                        results.get('weather', {}),
+                        results.get('evi', {}),
+                        results.get('savi', {})
+                    )
                 results['risk_assessment'] = risk_assessment
             except Exception as risk_error:
                 print(f"Risk assessment calculation error: {risk_error}")
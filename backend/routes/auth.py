@@ -1,37 +1,28 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
 
 from models.schemas import UserCreate, UserLogin, TokenResponse, UserResponse
 from auth.dependencies import get_current_user, create_access_token
 from database import db
+from orjson_route import ORJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ORJSONRoute)
 
 
 async def authenticate_user_background(email: str, password: str) -> Dict[str, Any]:
     """Run user authentication in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, db.authenticate_user, email, password)
-        return result
+    return await asyncio.to_thread(db.authenticate_user, email, password)
 
 
 async def create_user_background(email: str, password: str) -> Dict[str, Any]:
     """Run user creation in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, db.create_user, email, password)
-        return result
+    return await asyncio.to_thread(db.create_user, email, password)
 
 
 async def get_user_background(user_id: str) -> Dict[str, Any]:
     """Run user retrieval in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, db.get_user_by_id, user_id)
-        return result
+    return await asyncio.to_thread(db.get_user_by_id, user_id)
 
 
 @router.post("/register", response_model=TokenResponse)
@@ -43,7 +34,7 @@ async def register(request: UserCreate):
             raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
 
         # Check if user already exists
-        if db.user_exists(request.email):
+        if await asyncio.to_thread(db.user_exists, request.email):
             raise HTTPException(status_code=409, detail="User already exists")
 
         # Create new user
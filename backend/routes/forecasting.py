@@ -1,27 +1,28 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import time
+import uuid
 from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
 from typing import Dict, Any
-import pandas as pd
+from datetime import datetime
 
 from models.schemas import VegetationForecastRequest, TaskStatusResponse, VegetationIndexForecastRequest
 from auth.dependencies import get_current_user
 from ndvi_forecast_ml import GEEForecaster
 from gee_processor import initialize_gee
 from database import db
-from forecasting import forecast_ndvi
+from forecast_writer import forecast_writer
+from task_store import background_tasks_store, get_user_task
+from orjson_route import ORJSONRoute
+from cache import response_cache, make_etag, FORECAST_TTL
 
-router = APIRouter()
+router = APIRouter(route_class=ORJSONRoute)
 
-# Global task storage for background tasks
-background_tasks_store: Dict[str, Dict[str, Any]] = {}
 
-
-async def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], periods: list, user_id: str, use_fallback: bool = True):
-    """Background task to train and forecast with GEEForecaster."""
+def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], periods: list, user_id: str, use_fallback: bool = True):
+    """Background task to train and forecast with GEEForecaster (runs in the threadpool, off the event loop)."""
     try:
-        start_time = asyncio.get_event_loop().time()
-        background_tasks_store[task_id] = {'status': 'processing', 'start_time': start_time}
+        start_time = time.time()
+        background_tasks_store[task_id] = {'status': 'processing', 'user_id': user_id, 'start_time': start_time}
 
         # Debug: Log the geometry info
         print(f"[DEBUG] ML Forecast Task {task_id}: Processing geometry with {len(geometry.get('coordinates', []))} coordinate rings")
@@ -37,10 +38,11 @@ async def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], per
         # Initialize GEE if not already done
         if not initialize_gee():
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': 'Google Earth Engine initialization failed. Please ensure GEE is properly configured.',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
 
@@ -50,10 +52,11 @@ async def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], per
             roi = ee.Geometry.Polygon(geometry['coordinates'])
         except Exception as e:
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': f'Invalid geometry format: {str(e)}',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
 
@@ -67,10 +70,11 @@ async def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], per
             forecaster = GEEForecaster(roi, start_date, end_date)
         except Exception as e:
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': f'Failed to initialize forecaster: {str(e)}',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
 
@@ -79,19 +83,21 @@ async def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], per
             training_result = forecaster.train_models(include_validation=False, include_cv=False)
         except Exception as e:
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': f'Model training failed: {str(e)}',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
             
         if 'error' in training_result:
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': f'Model training failed: {training_result["error"]}',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
 
@@ -100,54 +106,71 @@ async def run_ml_forecast_background(task_id: str, geometry: Dict[str, Any], per
             forecast_result = forecaster.forecast(periods)
         except Exception as e:
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': f'Forecasting failed: {str(e)}',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
             
         if 'error' in forecast_result:
             background_tasks_store[task_id] = {
+                'user_id': user_id,
                 'status': 'failed',
                 'error': f'Forecasting failed: {forecast_result["error"]}',
                 'start_time': start_time,
-                'end_time': asyncio.get_event_loop().time()
+                'end_time': time.time()
             }
             return
 
-        # Save forecast to database
-        try:
-            forecast_data = {
-                **forecast_result,
-                'method_used': 'ml',
-                'fallback_used': False
-            }
-            db.save_forecast(user_id, geometry, forecast_data)
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
+        forecast_data = {
+            **forecast_result,
+            'method_used': 'ml',
+            'fallback_used': False
+        }
 
-        # Store results
+        # Store results first so the client sees completion without waiting on the save
         background_tasks_store[task_id] = {
+            'user_id': user_id,
             'status': 'completed',
-            'result': {
-                **forecast_result,
-                'method_used': 'ml',
-                'fallback_used': False
-            },
+            'result': forecast_data,
             'start_time': start_time,
-            'end_time': asyncio.get_event_loop().time()
+            'end_time': time.time()
         }
 
+        # Queue the forecast for the next bulk database insert
+        try:
+            forecast_writer.add(user_id, geometry, forecast_data)
+        except Exception as db_error:
+            print(f"Database save error: {db_error}")
+
     except Exception as e:
         background_tasks_store[task_id] = {
+            'user_id': user_id,
             'status': 'failed',
             'error': str(e),
             'start_time': background_tasks_store.get(task_id, {}).get('start_time'),
-            'end_time': asyncio.get_event_loop().time()
+            'end_time': time.time()
         }
 
 
+def run_claimed_forecast_background(claim_key: str, task_id: str, *args):
+    """Run the ML forecast task, then release its claim so the next identical request starts fresh."""
+    try:
+        run_ml_forecast_background(task_id, *args)
+    finally:
+        background_tasks_store.release(claim_key, task_id)
+
+
+def save_forecast_background(user_id: str, geometry: Dict[str, Any], forecast_data: Dict[str, Any]):
+    """Background task to queue forecast results for the next bulk database insert."""
+    try:
+        forecast_writer.add(user_id, geometry, forecast_data)
+    except Exception as e:
+        print(f"Background forecast save error: {e}")
+
+
 @router.post("/vegetation")
 async def forecast_vegetation(
     request: VegetationForecastRequest,
@@ -167,13 +190,26 @@ async def forecast_vegetation(
         if any(p > 24 for p in periods):
             raise HTTPException(status_code=400, detail="Maximum forecast period is 24 months")
 
-        # Generate unique task ID
-        import time
-        task_id = f"veg_forecast_{int(time.time())}_{hash(str(geometry)) % 10000}"
+        # Random task ID: it must be unguessable and must not collide for identical requests
+        task_id = f"veg_forecast_{uuid.uuid4().hex}"
         user_id = current_user['user_id']
 
+        # A user's identical requests share the task already training for this area and horizon.
+        # The claim is per user because the task saves its result to the claimant's history only.
+        claim_key = f"veg_forecast:{user_id}:{db.generate_geometry_hash(geometry)}:{','.join(map(str, sorted(periods)))}"
+        running_task_id = await asyncio.to_thread(background_tasks_store.claim, claim_key, task_id)
+        if running_task_id != task_id:
+            return {
+                'task_id': running_task_id,
+                'status': 'running',
+                'message': 'An identical vegetation forecasting task is already running',
+                'periods': periods,
+                'fallback_enabled': use_fallback
+            }
+
         # Start background task
-        background_tasks.add_task(run_ml_forecast_background, task_id, geometry, periods, user_id, use_fallback)
+        await asyncio.to_thread(background_tasks_store.__setitem__, task_id, {'status': 'pending', 'user_id': user_id, 'start_time': time.time()})
+        background_tasks.add_task(run_claimed_forecast_background, claim_key, task_id, geometry, periods, user_id, use_fallback)
 
         return {
             'task_id': task_id,
@@ -195,10 +231,10 @@ async def get_forecast_status(
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Check status of forecasting task."""
-    if task_id not in background_tasks_store:
+    task = await asyncio.to_thread(get_user_task, task_id, current_user['user_id'])
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    task = background_tasks_store[task_id]
     response = {'task_id': task_id, 'status': task['status']}
 
     if task['status'] == 'completed':
@@ -219,6 +255,7 @@ async def get_forecast_status(
 @router.post("/vis")
 async def forecast_vis(
     request: VegetationIndexForecastRequest,
+    background_tasks: BackgroundTasks,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Forecast vegetation indices using statistical models."""
@@ -230,23 +267,33 @@ async def forecast_vis(
 
         geometry_hash = db.generate_geometry_hash(geometry) if geometry else None
 
-        forecast_data = forecast_ndvi(historical_ndvi, months, geometry_hash, use_sarima=True)
+        # The same area, horizon and history always produce the same forecast
+        history_hash = make_etag(historical_ndvi).strip('"')
+        cache_key = f"fcst:{geometry_hash}:{months}:{history_hash}"
+        cached = await asyncio.to_thread(response_cache.get, cache_key)
+        if cached is not None:
+            # Still record the forecast in this user's history
+            background_tasks.add_task(save_forecast_background, user_id, geometry, cached)
+            return {**cached, 'cached': True}
+
+        # Imported lazily: statsmodels and pandas are only needed once a forecast runs
+        from forecasting import forecast_ndvi
+        forecast_data = await asyncio.to_thread(forecast_ndvi, historical_ndvi, months, geometry_hash, use_sarima=True)
 
         if 'error' not in forecast_data:
             forecast_data['metadata'] = {
                 'model': 'SARIMA',
-                'run_date': pd.Timestamp.now().isoformat(),
+                'run_date': datetime.now().isoformat(),
                 'parameters': {
                     'periods': months,
                     'confidence_intervals': True
                 },
                 'source': 'Historical Vegetation Indices data'
             }
+            await asyncio.to_thread(response_cache.set, cache_key, forecast_data, FORECAST_TTL)
 
-        try:
-            db.save_forecast(user_id, geometry, forecast_data)
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
+        # Save to database after the response is sent
+        background_tasks.add_task(save_forecast_background, user_id, geometry, forecast_data)
 
         return forecast_data
 
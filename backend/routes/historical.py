@@ -1,58 +1,136 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, Request, Response
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
-import pandas as pd
+import numpy as np
 
-from models.schemas import HistoricalVISRequest, HistoricalData
+from models.schemas import Geometry, HistoricalVISRequest, HistoricalData
 from auth.dependencies import get_current_user
 from gee_processor import get_historical_ndvi, get_historical_evi, get_historical_savi, get_historical_vis
 from weather_integration import get_historical_weather
 from database import db
+from metrics import stage_timer, timed
+from cache import response_cache, HISTORICAL_TTL, make_etag, etag_matches, etag_headers
+from pydantic import BaseModel
 
-router = APIRouter()
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+from orjson_route import ORJSONRoute
+
+router = APIRouter(route_class=ORJSONRoute)
+
+
+def get_cached_historical(data_type: str, cache_key: str, years: int, lat: float = None, lon: float = None) -> Optional[Dict[str, Any]]:
+    """Look up cached historical data in the response cache, then in the database cache."""
+    response_key = f"historical:{data_type}:{cache_key}:{years}"
+    cached_data = response_cache.get(response_key)
+    if cached_data is None:
+        cached_data = db.get_cached_historical_data(data_type, cache_key, lat=lat, lon=lon, years=years)
+        if cached_data:
+            response_cache.set(response_key, {
+                'data': cached_data['data'],
+                'created_at': cached_data['created_at']
+            }, HISTORICAL_TTL)
+    return cached_data
+
+
+def save_cached_historical(data_type: str, cache_key: str, data: Dict[str, Any], years: int, lat: float = None, lon: float = None, created_at: str = None):
+    """Save historical data to the database cache and the response cache."""
+    try:
+        db.save_cached_historical_data(data_type, cache_key, data, lat=lat, lon=lon, years=years)
+    except Exception as cache_error:
+        print(f"Cache save error: {cache_error}")
+
+    response_cache.set(f"historical:{data_type}:{cache_key}:{years}", {
+        'data': data,
+        'created_at': created_at or datetime.utcnow().isoformat()
+    }, HISTORICAL_TTL)
+
+
+def trend_slope(arr: np.ndarray) -> float:
+    """Least-squares slope of a series against its sample index (closed form, no polyfit overhead)."""
+    if arr.size < 2:
+        return 0.0
+    x = np.arange(arr.size, dtype=np.float64)
+    x -= x.mean()
+    return float(np.dot(x, arr - arr.mean()) / np.dot(x, x))
+
+
+def summarize_index_values(values) -> Optional[Dict[str, Any]]:
+    """Summary statistics for a vegetation index series, ignoring missing values."""
+    arr = np.asarray([v for v in values if v is not None], dtype=np.float64)
+    arr = arr[~np.isnan(arr)]
+    if arr.size == 0:
+        return None
+    slope = round(trend_slope(arr), 6)
+    return {
+        'mean': round(float(arr.mean()), 4),
+        'median': round(float(np.median(arr)), 4),
+        'std_dev': round(float(arr.std(ddof=1)), 4) if arr.size > 1 else 0.0,
+        'min': round(float(arr.min()), 4),
+        'max': round(float(arr.max()), 4),
+        'trend': 'increasing' if slope > 0 else 'decreasing',
+        'slope_per_step': slope
+    }
+
+
+def not_modified(http_request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Return a 304 response if the client already has this version, else attach the ETag."""
+    if etag_matches(http_request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=etag_headers(etag))
+    response.headers.update(etag_headers(etag))
+    return None
+
+
+def negotiate(http_request: Request, response: Response, payload: Any) -> Any:
+    """Serve payload as MessagePack when the client asks for it, otherwise leave it for JSON serialization."""
+    response.headers['Vary'] = 'Accept'
+    if msgpack is None or 'application/msgpack' not in (http_request.headers.get('accept') or ''):
+        return payload
+    content = payload.model_dump() if isinstance(payload, BaseModel) else payload
+    return Response(
+        msgpack.packb(content, use_bin_type=True),
+        media_type='application/msgpack',
+        headers={key: value for key, value in response.headers.items() if key != 'content-length'}
+    )
 
 
 async def get_historical_vis_background(geometry: Dict[str, Any], start_date: str, end_date: Optional[str]) -> Dict[str, Any]:
     """Run historical VIS data fetching in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_historical_vis, geometry, start_date, end_date)
-        return result
+    return await asyncio.to_thread(timed('historical_vis', 'gee', get_historical_vis), geometry, start_date, end_date)
 
 
-async def get_historical_evi_background(geometry: Dict[str, Any], years: int) -> Dict[str, Any]:
-    """Run historical EVI data fetching in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_historical_evi, geometry, years)
-        return result
+# Per-index GEE fetchers for the single-index historical routes
+HISTORICAL_INDEX_FETCHERS = {
+    'evi': get_historical_evi,
+    'savi': get_historical_savi,
+}
 
 
-async def get_historical_savi_background(geometry: Dict[str, Any], years: int) -> Dict[str, Any]:
-    """Run historical SAVI data fetching in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_historical_savi, geometry, years)
-        return result
+async def get_historical_index_background(index: str, geometry: Dict[str, Any], years: int) -> Dict[str, Any]:
+    """Run historical data fetching for a single vegetation index in thread pool."""
+    return await asyncio.to_thread(timed(f'historical_{index}', 'gee', HISTORICAL_INDEX_FETCHERS[index]), geometry, years)
 
 
 async def get_historical_weather_background(lat: float, lon: float, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
     """Run historical weather data fetching in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_historical_weather, lat, lon, start_date, end_date)
-        return result
+    return await asyncio.to_thread(timed('historical_weather', 'open_meteo', get_historical_weather), lat, lon, start_date, end_date)
 
 
-async def save_historical_background(user_id: str, geometry: Dict[str, Any], data: Dict[str, Any], data_type: str):
-    """Background task to save historical data to database."""
+def save_historical_background(user_id: str, geometry: Dict[str, Any], data: Dict[str, Any], data_type: str):
+    """Background task to save historical data to database (runs in the threadpool after the response)."""
     try:
-        if data_type == 'vis':
-            db.save_historical_ndvi(user_id, geometry, data)  # Reuse NDVI table for now
-        elif data_type == 'weather':
-            db.save_historical_weather(user_id, geometry.get('lat'), geometry.get('lon'), data)
+        with stage_timer(f'historical_{data_type}', 'db_save'):
+            if data_type == 'vis':
+                db.save_historical_ndvi(user_id, geometry, data)  # Reuse NDVI table for now
+            elif data_type == 'evi':
+                db.save_historical_evi(user_id, geometry, data)
+            elif data_type == 'savi':
+                db.save_historical_savi(user_id, geometry, data)
+            elif data_type == 'weather':
+                db.save_historical_weather(user_id, geometry.get('lat'), geometry.get('lon'), data)
     except Exception as e:
         print(f"Background historical save error: {e}")
 
@@ -60,6 +138,9 @@ async def save_historical_background(user_id: str, geometry: Dict[str, Any], dat
 @router.post("/vis", response_model=HistoricalData)
 async def get_historical_vis_route(
     request: HistoricalVISRequest,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Get historical NDVI, EVI, SAVI data for a geometry with caching."""
@@ -85,11 +166,14 @@ async def get_historical_vis_route(
         geometry_hash = db.generate_geometry_hash(geometry)
         date_range_key = f"{start_date}_{end_date or 'present'}"
         cache_key = f"{geometry_hash}_{date_range_key}"
-        cached_data = db.get_cached_historical_data('vis', cache_key, years=1)
+        cached_data = await asyncio.to_thread(get_cached_historical, 'vis', cache_key, years=1)
 
         if cached_data:
-            # Return cached data
-            return HistoricalData(
+            # Return cached data, or 304 if the client already has it
+            unchanged = not_modified(http_request, response, make_etag('vis', cache_key, 1, cached_data['created_at']))
+            if unchanged:
+                return unchanged
+            return negotiate(http_request, response, HistoricalData(
                 **cached_data['data'],
                 cached=True,
                 cache_timestamp=cached_data['created_at'],
@@ -101,7 +185,7 @@ async def get_historical_vis_route(
                     'end_date': end_date,
                     'data_points': len(cached_data['data'].get('dates', []))
                 }
-            )
+            ))
 
         # Compute new data
         historical_data = await get_historical_vis_background(geometry, start_date, end_date)
@@ -109,7 +193,7 @@ async def get_historical_vis_route(
         if 'dates' in historical_data:
             historical_data['metadata'] = {
                 'source': 'Google Earth Engine',
-                'timestamp': pd.Timestamp.now().isoformat(),
+                'timestamp': datetime.now().isoformat(),
                 'spatial_extent': geometry,
                 'start_date': start_date,
                 'end_date': end_date,
@@ -119,16 +203,17 @@ async def get_historical_vis_route(
             # Calculate summary statistics for each index
             for index in ['ndvi_values', 'evi_values', 'savi_values']:
                 if index in historical_data and historical_data[index]:
-                    values = [v for v in historical_data[index] if v is not None]
-                    if values:
-                        historical_data[f'{index.split("_")[0]}_statistics'] = {
-                            'mean': round(sum(values) / len(values), 4),
-                            'median': round(sorted(values)[len(values)//2], 4),
-                            'std_dev': round(pd.Series(values).std(), 4),
-                            'min': round(min(values), 4),
-                            'max': round(max(values), 4),
-                            'trend': 'increasing' if values[-1] > values[0] else 'decreasing'
-                        }
+                    index_statistics = summarize_index_values(historical_data[index])
+                    if index_statistics:
+                        historical_data[f'{index.split("_")[0]}_statistics'] = index_statistics
+
+            # Short/medium/long EWMA features for downstream models
+            from forecasting import calculate_ewma_features
+            historical_data['features'] = {
+                index.split('_')[0]: calculate_ewma_features(historical_data[index])
+                for index in ['ndvi_values', 'evi_values', 'savi_values']
+                if historical_data.get(index)
+            }
         else:
             historical_data = {
                 'error': 'Failed to retrieve historical VI data',
@@ -138,19 +223,14 @@ async def get_historical_vis_route(
                 'savi_values': []
             }
 
-        # Save to cache
-        try:
-            db.save_cached_historical_data('vis', cache_key, historical_data, years=1)
-        except Exception as cache_error:
-            print(f"Cache save error: {cache_error}")
-
-        # Save to database
-        try:
-            db.save_historical_ndvi(user_id, geometry, historical_data)  # Reuse NDVI table for now
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
+        # Save to cache and database after the response is sent
+        created_at = datetime.utcnow().isoformat()
+        if 'error' not in historical_data:
+            response.headers.update(etag_headers(make_etag('vis', cache_key, 1, created_at)))
+        background_tasks.add_task(save_cached_historical, 'vis', cache_key, historical_data, years=1, created_at=created_at)
+        background_tasks.add_task(save_historical_background, user_id, geometry, historical_data, 'vis')
 
-        return HistoricalData(**historical_data, cached=False)
+        return negotiate(http_request, response, HistoricalData(**historical_data, cached=False))
 
     except HTTPException:
         raise
@@ -158,88 +238,72 @@ async def get_historical_vis_route(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def historical_index_response(
+    index: str,
+    geometry: Dict[str, Any],
+    years: int,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
+    user_id: str
+) -> Any:
+    """Shared cache-lookup, compute and save sequence for the single-index historical routes."""
+    # Check cache first
+    geometry_hash = db.generate_geometry_hash(geometry)
+    cached_data = await asyncio.to_thread(get_cached_historical, index, geometry_hash, years=years)
+
+    if cached_data:
+        # Return cached data, or 304 if the client already has it
+        unchanged = not_modified(http_request, response, make_etag(index, geometry_hash, years, cached_data['created_at']))
+        if unchanged:
+            return unchanged
+        # cached_data is freshly decoded per request, so its payload can be annotated in place
+        payload = cached_data['data']
+        payload['cached'] = True
+        payload['cache_timestamp'] = cached_data['created_at']
+        return negotiate(http_request, response, payload)
+
+    # Compute new data
+    historical_data = await get_historical_index_background(index, geometry, years)
+
+    # Save to cache and database after the response is sent
+    created_at = datetime.utcnow().isoformat()
+    if 'error' not in historical_data:
+        response.headers.update(etag_headers(make_etag(index, geometry_hash, years, created_at)))
+    background_tasks.add_task(save_cached_historical, index, geometry_hash, historical_data, years=years, created_at=created_at)
+    background_tasks.add_task(save_historical_background, user_id, geometry, historical_data, index)
+
+    return negotiate(http_request, response, {**historical_data, 'cached': False})
+
+
 @router.post("/evi")
 async def get_historical_evi_route(
-    geometry: Dict[str, Any],
+    geometry: Geometry,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
     years: int = 10,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Get historical EVI data for a geometry with caching."""
     try:
-        user_id = current_user['user_id']
-
-        # Check cache first
-        geometry_hash = db.generate_geometry_hash(geometry)
-        cached_data = db.get_cached_historical_data('evi', geometry_hash, years=years)
-
-        if cached_data:
-            # Return cached data
-            return {
-                **cached_data['data'],
-                'cached': True,
-                'cache_timestamp': cached_data['created_at']
-            }
-
-        # Compute new data
-        historical_data = await get_historical_evi_background(geometry, years)
-
-        # Save to cache
-        try:
-            db.save_cached_historical_data('evi', geometry_hash, historical_data, years=years)
-        except Exception as cache_error:
-            print(f"Cache save error: {cache_error}")
-
-        # Save to database
-        try:
-            db.save_historical_evi(user_id, geometry, historical_data)
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
-
-        return {**historical_data, 'cached': False}
-
+        return await historical_index_response('evi', geometry.dict(), years, background_tasks, http_request, response, current_user['user_id'])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/savi")
 async def get_historical_savi_route(
-    geometry: Dict[str, Any],
+    geometry: Geometry,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
     years: int = 10,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Get historical SAVI data for a geometry with caching."""
     try:
-        user_id = current_user['user_id']
-
-        # Check cache first
-        geometry_hash = db.generate_geometry_hash(geometry)
-        cached_data = db.get_cached_historical_data('savi', geometry_hash, years=years)
-
-        if cached_data:
-            # Return cached data
-            return {
-                **cached_data['data'],
-                'cached': True,
-                'cache_timestamp': cached_data['created_at']
-            }
-
-        # Compute new data
-        historical_data = await get_historical_savi_background(geometry, years)
-
-        # Save to cache
-        try:
-            db.save_cached_historical_data('savi', geometry_hash, historical_data, years=years)
-        except Exception as cache_error:
-            print(f"Cache save error: {cache_error}")
-
-        # Save to database
-        try:
-            db.save_historical_savi(user_id, geometry, historical_data)
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
-
-        return {**historical_data, 'cached': False}
-
+        return await historical_index_response('savi', geometry.dict(), years, background_tasks, http_request, response, current_user['user_id'])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -248,6 +312,9 @@ async def get_historical_savi_route(
 async def get_historical_weather_route(
     lat: float,
     lon: float,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
     start_date: str = Query(..., description="Start date in ISO format"),
     end_date: str = Query(None, description="End date in ISO format"),
     days: int = Query(None, description="Number of days backward from now"),
@@ -285,27 +352,36 @@ async def get_historical_weather_route(
             end = datetime.now()
             start = end - timedelta(days=30)
 
+        # The archive serves daily values on a coarse grid and is only queried by date: round
+        # coordinates to 4 decimals (~11 m) and drop the time of day, so nearby and repeated
+        # requests share one cached fetch and concurrent identical fetches are coalesced
+        lat, lon = round(lat, 4), round(lon, 4)
+        start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+
         # Check cache first
         location_key = f"{lat}_{lon}"
         date_range_key = f"{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}"
         cache_key = f"{location_key}_{date_range_key}"
-        cached_data = db.get_cached_historical_data('weather', cache_key, lat=lat, lon=lon, years=1)
+        cached_data = await asyncio.to_thread(get_cached_historical, 'weather', cache_key, years=1, lat=lat, lon=lon)
 
         if cached_data:
-            # Return cached data
-            return {
-                **cached_data['data'],
-                'cached': True,
-                'cache_timestamp': cached_data['created_at'],
-                'metadata': {
-                    'source': 'Open-Meteo API',
-                    'timestamp': cached_data['created_at'],
-                    'location': {'lat': lat, 'lon': lon},
-                    'start_date': start.isoformat(),
-                    'end_date': end.isoformat(),
-                    'period_days': (end - start).days
-                }
+            # Return cached data, or 304 if the client already has it
+            unchanged = not_modified(http_request, response, make_etag('weather', cache_key, 1, cached_data['created_at']))
+            if unchanged:
+                return unchanged
+            payload = cached_data['data']
+            payload['cached'] = True
+            payload['cache_timestamp'] = cached_data['created_at']
+            payload['metadata'] = {
+                'source': 'Open-Meteo API',
+                'timestamp': cached_data['created_at'],
+                'location': {'lat': lat, 'lon': lon},
+                'start_date': start.isoformat(),
+                'end_date': end.isoformat(),
+                'period_days': (end - start).days
             }
+            return negotiate(http_request, response, payload)
 
         # Compute new data - get historical data for the specified range
         historical_data = await get_historical_weather_background(lat, lon, start, end)
@@ -314,24 +390,35 @@ async def get_historical_weather_route(
             # Process the data (already in daily format from get_historical_weather)
             weather_data = historical_data['data']
 
-            # Ensure we have the required fields including humidity
-            processed_data = []
-            for entry in weather_data:
-                processed_entry = {
-                    'date': entry['date'],
-                    'temperature': entry['temperature'],
-                    'humidity': entry.get('humidity', entry.get('relative_humidity', 60)),  # Support both field names
-                    'precipitation': entry['precipitation'],
-                    'temp_min': entry.get('temp_min', entry['temperature'] - 2),
-                    'temp_max': entry.get('temp_max', entry['temperature'] + 2)
+            # Column arrays for the required fields including humidity
+            dates = [entry['date'] for entry in weather_data]
+            temps = np.array([entry['temperature'] for entry in weather_data], dtype=np.float64)
+            humidity = np.array([entry.get('humidity', entry.get('relative_humidity', 60)) for entry in weather_data], dtype=np.float64)  # Support both field names
+            precip = np.array([entry['precipitation'] for entry in weather_data], dtype=np.float64)
+            temp_min = np.array([entry.get('temp_min', np.nan) for entry in weather_data], dtype=np.float64)
+            temp_max = np.array([entry.get('temp_max', np.nan) for entry in weather_data], dtype=np.float64)
+            temp_min = np.where(np.isnan(temp_min), temps - 2, temp_min)
+            temp_max = np.where(np.isnan(temp_max), temps + 2, temp_max)
+
+            processed_data = [
+                {
+                    'date': date,
+                    'temperature': temperature,
+                    'humidity': day_humidity,
+                    'precipitation': precipitation,
+                    'temp_min': day_min,
+                    'temp_max': day_max
                 }
-                processed_data.append(processed_entry)
+                for date, temperature, day_humidity, precipitation, day_min, day_max in zip(
+                    dates, temps.tolist(), humidity.tolist(), precip.tolist(), temp_min.tolist(), temp_max.tolist()
+                )
+            ]
 
             historical_data = {
                 'data': processed_data,
                 'metadata': {
                     'source': 'Open-Meteo API',
-                    'timestamp': pd.Timestamp.now().isoformat(),
+                    'timestamp': datetime.now().isoformat(),
                     'location': {'lat': lat, 'lon': lon},
                     'start_date': start.isoformat(),
                     'end_date': end.isoformat(),
@@ -342,17 +429,13 @@ async def get_historical_weather_route(
 
             # Calculate summary statistics
             if processed_data:
-                temps = [day['temperature'] for day in processed_data]
-                humidity = [day['humidity'] for day in processed_data]
-                precip = [day['precipitation'] for day in processed_data]
-
                 historical_data['statistics'] = {
-                    'avg_temperature': round(sum(temps) / len(temps), 1),
-                    'avg_humidity': round(sum(humidity) / len(humidity), 1),
-                    'total_precipitation': round(sum(precip), 1),
-                    'temp_range': f"{round(min(temps), 1)}°C - {round(max(temps), 1)}°C",
-                    'humidity_range': f"{round(min(humidity), 1)}% - {round(max(humidity), 1)}%",
-                    'precipitation_trend': 'increasing' if len(precip) > 1 and precip[-1] > precip[0] else 'decreasing'
+                    'avg_temperature': round(float(temps.mean()), 1),
+                    'avg_humidity': round(float(humidity.mean()), 1),
+                    'total_precipitation': round(float(precip.sum()), 1),
+                    'temp_range': f"{round(float(temps.min()), 1)}°C - {round(float(temps.max()), 1)}°C",
+                    'humidity_range': f"{round(float(humidity.min()), 1)}% - {round(float(humidity.max()), 1)}%",
+                    'precipitation_trend': 'increasing' if trend_slope(precip) > 0 else 'decreasing'
                 }
         else:
             historical_data = {
@@ -360,19 +443,14 @@ async def get_historical_weather_route(
                 'data': []
             }
 
-        # Save to cache
-        try:
-            db.save_cached_historical_data('weather', cache_key, historical_data, lat=lat, lon=lon, years=1)
-        except Exception as cache_error:
-            print(f"Cache save error: {cache_error}")
-
-        # Save to database
-        try:
-            db.save_historical_weather(user_id, lat, lon, historical_data)
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
+        # Save to cache and database after the response is sent
+        created_at = datetime.utcnow().isoformat()
+        if 'error' not in historical_data:
+            response.headers.update(etag_headers(make_etag('weather', cache_key, 1, created_at)))
+        background_tasks.add_task(save_cached_historical, 'weather', cache_key, historical_data, years=1, lat=lat, lon=lon, created_at=created_at)
+        background_tasks.add_task(save_historical_background, user_id, {'lat': lat, 'lon': lon}, historical_data, 'weather')
 
-        return {**historical_data, 'cached': False}
+        return negotiate(http_request, response, {**historical_data, 'cached': False})
 
     except HTTPException:
         raise
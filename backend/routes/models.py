@@ -1,22 +1,25 @@
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
 from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks
 from typing import Dict, Any, List
 import os
 import json
 import time
+import uuid
 from datetime import datetime, timedelta
 
 from auth.dependencies import get_current_user
 from gee_processor import initialize_gee
 from ndvi_forecast_ml import GEEForecaster
 from database import db
+from task_store import background_tasks_store
+from orjson_route import ORJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ORJSONRoute)
 
 
-async def run_model_training_background(task_id: str, geometry: Dict[str, Any], user_id: str, settings: Dict[str, Any]):
-    """Background task to train ML models for a specific ROI."""
+def run_model_training_background(task_id: str, geometry: Dict[str, Any], user_id: str, settings: Dict[str, Any]):
+    """Background task to train ML models for a specific ROI (runs in the threadpool, off the event loop)."""
+    start_time = time.time()
+    background_tasks_store[task_id] = {'status': 'processing', 'user_id': user_id, 'start_time': start_time}
     try:
         # Initialize GEE if not already done
         if not initialize_gee():
@@ -54,19 +57,23 @@ async def run_model_training_background(task_id: str, geometry: Dict[str, Any],
 
         # Save to database or file system
         # For now, just return the result
+        background_tasks_store[task_id] = {
+            'user_id': user_id,
+            'status': 'completed',
+            'result': result,
+            'start_time': start_time,
+            'end_time': time.time()
+        }
 
     except Exception as e:
-        result = {
+        background_tasks_store[task_id] = {
+            'user_id': user_id,
+            'status': 'failed',
             'error': str(e),
-            'created_at': datetime.now().isoformat()
+            'start_time': start_time,
+            'end_time': time.time()
         }
 
-    # Store results in a global dict for retrieval
-    global background_tasks_store
-    if 'background_tasks_store' not in globals():
-        background_tasks_store = {}
-    background_tasks_store[task_id] = result
-
 
 @router.get("/list")
 async def list_models(current_user: Dict[str, Any] = Depends(get_current_user)):
@@ -141,8 +148,8 @@ async def train_model(
             'test_size': min(max(settings.get('test_size', 0.3), 0.1), 0.5)
         }
 
-        # Generate unique task ID
-        task_id = f"model_train_{int(time.time())}_{hash(str(geometry)) % 10000}"
+        # Random task ID so other users cannot guess it
+        task_id = f"model_train_{uuid.uuid4().hex}"
         user_id = current_user['user_id']
 
         # Start async training task
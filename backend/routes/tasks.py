@@ -1,30 +1,31 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import Dict, Any
+import re
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import Dict, Any, Optional
 import time
 import json
+import orjson
 from datetime import datetime, timedelta
 
 from auth.dependencies import get_current_user
-from forecasting import forecast_ndvi
 from gee_processor import initialize_gee, get_historical_ndvi
 from ndvi_forecast_ml import GEEForecaster
 from database import db
+from task_store import get_user_task
+from cache import history_versions, make_etag, etag_matches, etag_headers
+from orjson_route import ORJSONRoute
 
-router = APIRouter()
-
-# Global task storage for background tasks
-background_tasks_store: Dict[str, Dict[str, Any]] = {}
+router = APIRouter(route_class=ORJSONRoute)
 
 
 @router.get("/task/{task_id}")
-async def get_task_status(task_id: str):
-    """Get status of background task."""
-    if task_id not in background_tasks_store:
+async def get_task_status(task_id: str, current_user: Dict[str, Any] = Depends(get_current_user)):
+    """Get status of one of the current user's background tasks."""
+    task = await asyncio.to_thread(get_user_task, task_id, current_user['user_id'])
+    if task is None:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    task = background_tasks_store[task_id]
     response = {'task_id': task_id, 'status': task.get('status', 'unknown')}
 
     if task.get('status') == 'completed':
@@ -42,42 +43,95 @@ async def get_task_status(task_id: str):
     return response
 
 
-@router.get("/history/{user_id}")
-async def get_history(user_id: str):
-    """Get user's analysis and forecast history."""
+async def fetch_history_section(key: str, query_func, *args) -> tuple:
+    """Run a blocking history query in the default thread pool; return (key, rows, error)."""
     try:
-        data_type = request.args.get('type', 'all')  # analyses, historical, forecasts, all
-
-        results = {}
-
-        if data_type in ['analyses', 'all']:
-            analyses = db.get_user_analyses(user_id)
-            results['analyses'] = analyses.data if analyses else []
+        result = await asyncio.to_thread(query_func, *args)
+    except Exception as e:
+        print(f"History query error ({key}): {e}")
+        return key, None, str(e)
+    # The db helpers return None when the query failed
+    if result is None:
+        return key, None, 'History query failed'
+    return key, result.data, None
 
-        if data_type in ['historical', 'all']:
-            ndvi_history = db.get_historical_data(user_id, 'ndvi')
-            weather_history = db.get_historical_data(user_id, 'weather')
-            results['historical_ndvi'] = ndvi_history.data if ndvi_history else []
-            results['historical_weather'] = weather_history.data if weather_history else []
 
-        if data_type in ['forecasts', 'all']:
-            forecasts = db.get_forecasts(user_id)
-            results['forecasts'] = forecasts.data if forecasts else []
+HISTORY_PAGE_SIZE = 100
+MAX_HISTORY_PAGE_SIZE = 500
+FIELD_NAME = re.compile(r'^[a-z_][a-z0-9_]*$')
 
-        return results
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@router.get("/history/{user_id}")
+async def get_history(
+    user_id: str,
+    http_request: Request,
+    data_type: str = Query('all', alias='type', description="analyses, historical, forecasts or all"),
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE, description="Rows per section"),
+    offset: int = Query(0, ge=0, description="Rows to skip in each section"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get a page of the user's analysis and forecast history."""
+    if current_user['user_id'] != user_id:
+        raise HTTPException(status_code=403, detail="Not allowed to view another user's history")
+
+    columns = '*'
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        if not names or not all(FIELD_NAME.match(name) for name in names):
+            raise HTTPException(status_code=400, detail="fields must be a comma-separated list of column names")
+        columns = ','.join(names)
+
+    # Saves bump per-section version counters, so an unchanged version means an unchanged page.
+    # ETags are only ever issued for complete responses, so a match never revives a partial one.
+    etag = None
+    versions = await asyncio.to_thread(history_versions, user_id)
+    if versions is not None:
+        etag = make_etag('history', user_id, data_type, limit, offset, columns, versions)
+        if etag_matches(http_request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=etag_headers(etag, max_age=0))
+
+    queries = []
+    if data_type in ['analyses', 'all']:
+        queries.append(('analyses', db.get_user_analyses, user_id, limit, offset, columns))
+    if data_type in ['historical', 'all']:
+        queries.append(('historical_ndvi', db.get_historical_data, user_id, 'ndvi', limit, offset, columns))
+        queries.append(('historical_weather', db.get_historical_data, user_id, 'weather', limit, offset, columns))
+    if data_type in ['forecasts', 'all']:
+        queries.append(('forecasts', db.get_forecasts, user_id, limit, offset, columns))
+
+    # Run the queries concurrently up front so the headers can reflect whether every section succeeded
+    sections = await asyncio.gather(*(fetch_history_section(*query) for query in queries))
+    complete = all(error is None for _, _, error in sections)
+    if etag is not None and complete:
+        headers = etag_headers(etag, max_age=0)
+    else:
+        headers = {} if complete else {'Cache-Control': 'no-store'}
+
+    async def stream_history():
+        # Serialize one section at a time rather than building the whole body
+        yield b'{'
+        separator = ''
+        for key, data, error in sections:
+            if error is not None:
+                # Report the failed section explicitly rather than silently leaving it out
+                yield f'{separator}{json.dumps(key + "_error")}:{json.dumps(error)}'.encode()
+            else:
+                yield f'{separator}{json.dumps(key)}:'.encode() + orjson.dumps(data, default=str)
+            separator = ','
+        yield f'{separator}"next_offset":{offset + limit}}}'.encode()
+
+    return StreamingResponse(stream_history(), media_type='application/json', headers=headers)
 
 
 @router.post("/forecast/compare")
-async def compare_forecasts(
+def compare_forecasts(
     geometry: Dict[str, Any],
     periods: list = [3, 6, 12],
     model_key: str = None,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Compare ML and statistical forecasting models."""
+    """Compare ML and statistical forecasting models (sync, so FastAPI runs it in the threadpool)."""
     try:
         if not geometry:
             raise HTTPException(status_code=400, detail="No geometry provided")
@@ -105,7 +159,8 @@ async def compare_forecasts(
             'values': historical_data['ndvi_values']
         }
 
-        # Generate statistical forecast
+        # Generate statistical forecast (statsmodels and pandas are imported lazily)
+        from forecasting import forecast_ndvi
         statistical_forecast = forecast_ndvi(historical_ndvi, max(periods))
 
         # Try to get ML forecast
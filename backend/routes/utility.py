@@ -1,25 +1,80 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import hashlib
+import threading
+import time
 from fastapi import APIRouter, HTTPException, Depends
 from typing import Dict, Any
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 
-from models.schemas import GeocodeRequest, GeocodeResponse, HealthResponse
+from models.schemas import (
+    GeocodeRequest, GeocodeResponse, BatchGeocodeRequest, BatchGeocodeResponse, HealthResponse
+)
 from auth.dependencies import get_current_user
 from config.config import Config
 from gee_processor import initialize_gee
 from database import db
+from cache import response_cache, GEOCODE_TTL, GEOCODE_MISS_TTL
+from orjson_route import ORJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=ORJSONRoute)
+
+# Shared session so repeated geocodes reuse pooled keep-alive connections
+GEOCODE_SESSION = requests.Session()
+GEOCODE_SESSION.headers.update({"User-Agent": "LandCare-AI/1.0"})
+GEOCODE_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=10,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504))
+))
+
+# Nominatim usage policy allows at most one request per second
+NOMINATIM_MIN_DELAY = 1.0
+_nominatim_lock = threading.Lock()
+_nominatim_last_call = 0.0
+
+# Maximum concurrent upstream lookups for a batch geocode
+BATCH_GEOCODE_CONCURRENCY = 4
+
+
+LOCATION_NOT_FOUND = 'Location not found'
+
+
+def geocode_cache_key(place_name: str) -> str:
+    """Cache key for a place name, normalized for case and whitespace."""
+    normalized = ' '.join(place_name.lower().split())
+    return f"geocode:{hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()}"
+
+
+async def cached_geocode(place_name: str, limiter: asyncio.Semaphore = None) -> Dict[str, Any]:
+    """Geocode through the response cache; unknown places are cached briefly as {'error': ...}.
+
+    Only cache misses acquire limiter, so hits are never queued behind upstream lookups.
+    """
+    cache_key = geocode_cache_key(place_name)
+    result = await asyncio.to_thread(response_cache.get, cache_key)
+    if result is not None:
+        return result
+    try:
+        async with limiter or contextlib.nullcontext():
+            result = await geocode_background(place_name)
+    except Exception as e:
+        if str(e) != LOCATION_NOT_FOUND:
+            raise
+        # Remember misses for a day so repeated typos don't hit the upstream rate limit
+        result = {'error': LOCATION_NOT_FOUND}
+        await asyncio.to_thread(response_cache.set, cache_key, result, GEOCODE_MISS_TTL)
+        return result
+    await asyncio.to_thread(response_cache.set, cache_key, result, GEOCODE_TTL)
+    return result
 
 
 async def geocode_background(place_name: str) -> Dict[str, Any]:
     """Run geocoding in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, perform_geocode, place_name)
-        return result
+    return await asyncio.to_thread(perform_geocode, place_name)
 
 
 def _perform_geocode_locationiq(place_name: str) -> Dict[str, Any]:
@@ -38,13 +93,13 @@ def _perform_geocode_locationiq(place_name: str) -> Dict[str, Any]:
         "normalizecity": 1
     }
 
-    response = requests.get(url, params=params, timeout=15)
+    response = GEOCODE_SESSION.get(url, params=params, timeout=15)
     if response.status_code != 200:
         raise Exception('Geocoding service unavailable')
 
     results = response.json()
     if not results:
-        raise Exception('Location not found')
+        raise Exception(LOCATION_NOT_FOUND)
 
     result = results[0]
     # LocationIQ typically returns boundingbox as [south, north, west, east] (strings)
@@ -69,17 +124,20 @@ def _perform_geocode_nominatim(place_name: str) -> Dict[str, Any]:
         "limit": 1,
         "addressdetails": 1
     }
-    headers = {
-        "User-Agent": "LandCare-AI/1.0"
-    }
-
-    response = requests.get(url, params=params, headers=headers, timeout=10)
+    global _nominatim_last_call
+    with _nominatim_lock:
+        wait = NOMINATIM_MIN_DELAY - (time.monotonic() - _nominatim_last_call)
+        if wait > 0:
+            time.sleep(wait)
+        _nominatim_last_call = time.monotonic()
+
+    response = GEOCODE_SESSION.get(url, params=params, timeout=15)
     if response.status_code != 200:
         raise Exception('Geocoding service unavailable')
 
     results = response.json()
     if not results:
-        raise Exception('Location not found')
+        raise Exception(LOCATION_NOT_FOUND)
 
     result = results[0]
     return {
@@ -126,7 +184,9 @@ async def geocode(request: GeocodeRequest):
         if not request.place_name:
             raise HTTPException(status_code=400, detail="No place name provided")
 
-        result = await geocode_background(request.place_name)
+        result = await cached_geocode(request.place_name)
+        if 'error' in result:
+            raise HTTPException(status_code=500, detail=result['error'])
         return GeocodeResponse(**result)
 
     except Exception as e:
@@ -135,11 +195,34 @@ async def geocode(request: GeocodeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/geocode/batch", response_model=BatchGeocodeResponse)
+async def geocode_batch(request: BatchGeocodeRequest):
+    """Geocode a list of place names, returning results in input order."""
+    # Deduplicate while preserving order so each name is looked up once
+    unique_names = list(dict.fromkeys(name.strip() for name in request.place_names if name.strip()))
+    semaphore = asyncio.Semaphore(BATCH_GEOCODE_CONCURRENCY)
+
+    async def lookup(place_name: str) -> Dict[str, Any]:
+        try:
+            return await cached_geocode(place_name, semaphore)
+        except Exception as e:
+            return {'error': str(e)}
+
+    lookups = await asyncio.gather(*(lookup(name) for name in unique_names))
+    resolved = dict(zip(unique_names, lookups))
+
+    results = []
+    for name in request.place_names:
+        result = resolved.get(name.strip(), {'error': 'No place name provided'})
+        results.append({'place_name': name, **result})
+    return BatchGeocodeResponse(results=results)
+
+
 @router.post("/cache/clear")
 async def clear_cache(current_user: Dict[str, Any] = Depends(get_current_user)):
     """Clear expired cache entries."""
     try:
-        result = db.clear_expired_cache()
+        result = await asyncio.to_thread(db.clear_expired_cache)
         return {"success": result, "message": "Cache cleanup completed"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,37 +1,33 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Request, Response
 from typing import Dict, Any
-import pandas as pd
+from datetime import datetime
+import numpy as np
 
 from models.schemas import ForecastResponse, WeatherForecastRequest
 from auth.dependencies import get_current_user
 from weather_integration import get_weather_data, get_weather_forecast
-from database import db
+from forecast_writer import forecast_writer
+from metrics import timed
+from cache import response_cache, coordinate_key, WEATHER_TTL, make_etag, etag_matches, etag_headers
 
 router = APIRouter()
 
 
 async def get_weather_background(lat: float, lon: float) -> Dict[str, Any]:
     """Run weather data fetching in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_weather_data, lat, lon)
-        return result
+    return await asyncio.to_thread(timed('weather', 'open_meteo', get_weather_data), lat, lon)
 
 
 async def get_forecast_background(lat: float, lon: float) -> Dict[str, Any]:
     """Run weather forecast fetching in thread pool."""
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        result = await loop.run_in_executor(executor, get_weather_forecast, lat, lon)
-        return result
+    return await asyncio.to_thread(timed('forecast', 'open_meteo', get_weather_forecast), lat, lon)
 
 
-async def save_forecast_background(user_id: str, lat: float, lon: float, forecast_data: Dict[str, Any]):
-    """Background task to save forecast results to database."""
+def save_forecast_background(user_id: str, lat: float, lon: float, forecast_data: Dict[str, Any]):
+    """Background task to queue forecast results for the next bulk database insert."""
     try:
-        db.save_forecast(user_id, {'type': 'weather', 'lat': lat, 'lon': lon}, forecast_data)
+        forecast_writer.add(user_id, {'type': 'weather', 'lat': lat, 'lon': lon}, forecast_data)
     except Exception as e:
         print(f"Background forecast save error: {e}")
 
@@ -40,7 +36,14 @@ async def save_forecast_background(user_id: str, lat: float, lon: float, forecas
 async def get_weather(lat: float, lon: float):
     """Get current weather for coordinates."""
     try:
+        cache_key = coordinate_key('weather', lat, lon)
+        cached = await asyncio.to_thread(response_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
         weather_data = await get_weather_background(lat, lon)
+        if 'error' not in weather_data:
+            await asyncio.to_thread(response_cache.set, cache_key, weather_data, WEATHER_TTL)
         return weather_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -50,6 +53,9 @@ async def get_weather(lat: float, lon: float):
 async def get_weather_forecast_route(
     lat: float,
     lon: float,
+    background_tasks: BackgroundTasks,
+    http_request: Request,
+    response: Response,
     days: int = 5,
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
@@ -60,8 +66,13 @@ async def get_weather_forecast_route(
 
         user_id = current_user['user_id']
 
-        # Get forecast data
-        forecast_data_raw = await get_forecast_background(lat, lon)
+        # Get forecast data (shared across users for the same location)
+        cache_key = coordinate_key('forecast', lat, lon)
+        forecast_data_raw = await asyncio.to_thread(response_cache.get, cache_key)
+        if forecast_data_raw is None:
+            forecast_data_raw = await get_forecast_background(lat, lon)
+            if 'error' not in forecast_data_raw:
+                await asyncio.to_thread(response_cache.set, cache_key, forecast_data_raw, WEATHER_TTL)
 
         if 'error' in forecast_data_raw:
             raise HTTPException(status_code=500, detail=f"Failed to get weather forecast: {forecast_data_raw['error']}")
@@ -75,37 +86,37 @@ async def get_weather_forecast_route(
         # Sort dates and extract data for the requested number of days
         sorted_dates = sorted(daily_summaries.keys())[:days]
 
-        temperatures = []
-        precipitations = []
-        humidities = []
+        temperatures = np.array([daily_summaries[date]['avg_temp'] for date in sorted_dates], dtype=np.float64)
+        precipitations = np.array([daily_summaries[date]['total_precipitation'] for date in sorted_dates], dtype=np.float64)
+        humidities = np.array([daily_summaries[date]['avg_humidity'] for date in sorted_dates], dtype=np.float64)
 
-        for date in sorted_dates:
-            day_data = daily_summaries[date]
-            temperatures.append(day_data['avg_temp'])
-            precipitations.append(day_data['total_precipitation'])
-            humidities.append(day_data['avg_humidity'])
+        # The forecast only changes when the upstream data does; let clients revalidate
+        etag = make_etag('forecast', cache_key, days, sorted_dates, temperatures.tolist(), precipitations.tolist(), humidities.tolist())
+        if etag_matches(http_request.headers.get('if-none-match'), etag):
+            return Response(status_code=304, headers=etag_headers(etag))
+        response.headers.update(etag_headers(etag))
 
         # Create forecast data in the format expected by frontend with simple uncertainty bounds
         forecast_data = {
             'forecast_dates': sorted_dates,
             'temperature': {
-                'values': temperatures,
-                'upper_bound': [v + 2 for v in temperatures],  # Simple uncertainty bounds
-                'lower_bound': [v - 2 for v in temperatures]
+                'values': temperatures.tolist(),
+                'upper_bound': (temperatures + 2).tolist(),  # Simple uncertainty bounds
+                'lower_bound': (temperatures - 2).tolist()
             },
             'precipitation': {
-                'values': [max(0, v) for v in precipitations],
-                'upper_bound': [max(0, v + 1) for v in precipitations],
-                'lower_bound': [max(0, v - 0.5) for v in precipitations]
+                'values': np.maximum(precipitations, 0).tolist(),
+                'upper_bound': np.maximum(precipitations + 1, 0).tolist(),
+                'lower_bound': np.maximum(precipitations - 0.5, 0).tolist()
             },
             'humidity': {
-                'values': humidities,
-                'upper_bound': [min(100, v + 5) for v in humidities],
-                'lower_bound': [max(0, v - 5) for v in humidities]
+                'values': humidities.tolist(),
+                'upper_bound': np.minimum(humidities + 5, 100).tolist(),
+                'lower_bound': np.maximum(humidities - 5, 0).tolist()
             },
             'metadata': {
                 'model_version': 'Open-Meteo Built-in',
-                'run_date': pd.Timestamp.now().isoformat(),
+                'run_date': datetime.now().isoformat(),
                 'forecast_period_days': days,
                 'location': {'lat': lat, 'lon': lon},
                 'source': 'Open-Meteo Forecast API',
@@ -113,11 +124,8 @@ async def get_weather_forecast_route(
             }
         }
 
-        # Save to database (using geometry as None for weather forecasts)
-        try:
-            db.save_forecast(user_id, {'type': 'weather', 'lat': lat, 'lon': lon}, forecast_data)
-        except Exception as db_error:
-            print(f"Database save error: {db_error}")
+        # Save to database after the response is sent
+        background_tasks.add_task(save_forecast_background, user_id, lat, lon, forecast_data)
 
         return ForecastResponse(**forecast_data)
 
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Dict
+from config.config import Config
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Tasks are kept for an hour after their last status update
+TASK_TTL = 60 * 60
+MAX_TASKS = 10000
+# Identical jobs are deduplicated for at most this long, in case a worker dies mid-task
+CLAIM_TTL = 10 * 60
+
+
+class TaskStore(MutableMapping):
+    def __init__(self, redis_url: str = None, ttl: int = TASK_TTL, maxsize: int = MAX_TASKS, prefix: str = 'landcare:task:',
+                 claim_prefix: str = 'landcare:claim:'):
+        """Store of background task state, shared by all routers.
+
+        With Redis configured, each task is a JSON value with a TTL, so status written by
+        one worker process is visible to every other worker and survives restarts.
+        Otherwise tasks live in a thread-safe in-process dict where entries expire ttl
+        seconds after they were last written and the oldest are evicted beyond maxsize.
+        """
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.prefix = prefix
+        self.claim_prefix = claim_prefix
+        self.client = None
+        self._tasks: OrderedDict = OrderedDict()
+        self._claims: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+        if redis_url and redis is not None:
+            try:
+                self.client = redis.Redis.from_url(redis_url)
+                self.client.ping()
+            except Exception as e:
+                print(f"Warning: Redis unavailable ({e}). Falling back to in-process task store.")
+                self.client = None
+
+    def _prune(self):
+        """Drop expired and excess in-process entries. Caller must hold the lock."""
+        # Entries are ordered by last write, so expired ones are at the front
+        now = time.time()
+        while self._tasks:
+            _, (_, written_at) = next(iter(self._tasks.items()))
+            if written_at + self.ttl > now and len(self._tasks) <= self.maxsize:
+                break
+            self._tasks.popitem(last=False)
+
+    def __getitem__(self, task_id: str) -> Dict[str, Any]:
+        if self.client is not None:
+            raw = self.client.get(self.prefix + task_id)
+            if raw is None:
+                raise KeyError(task_id)
+            return json.loads(raw)
+
+        with self._lock:
+            task, written_at = self._tasks[task_id]
+            if written_at + self.ttl <= time.time():
+                del self._tasks[task_id]
+                raise KeyError(task_id)
+            return task
+
+    def __setitem__(self, task_id: str, task: Dict[str, Any]):
+        if self.client is not None:
+            self.client.setex(self.prefix + task_id, self.ttl, json.dumps(task, default=str))
+            return
+
+        with self._lock:
+            self._tasks[task_id] = (task, time.time())
+            self._tasks.move_to_end(task_id)
+            self._prune()
+
+    def __delitem__(self, task_id: str):
+        if self.client is not None:
+            if not self.client.delete(self.prefix + task_id):
+                raise KeyError(task_id)
+            return
+
+        with self._lock:
+            del self._tasks[task_id]
+
+    def __iter__(self):
+        if self.client is not None:
+            return (key.decode()[len(self.prefix):] for key in self.client.scan_iter(match=self.prefix + '*'))
+
+        with self._lock:
+            self._prune()
+            return iter(list(self._tasks))
+
+    def __len__(self) -> int:
+        if self.client is not None:
+            return sum(1 for _ in self.client.scan_iter(match=self.prefix + '*'))
+
+        with self._lock:
+            self._prune()
+            return len(self._tasks)
+
+    def claim(self, key: str, task_id: str, ttl: int = CLAIM_TTL) -> str:
+        """Claim key for task_id unless another task holds it; return the holder's task id.
+
+        Used to run one task per identical job: callers that don't get their own
+        task_id back should point the client at the holder instead.
+        """
+        if self.client is not None:
+            if self.client.set(self.claim_prefix + key, task_id, nx=True, ex=ttl):
+                return task_id
+            holder = self.client.get(self.claim_prefix + key)
+            return holder.decode() if holder is not None else task_id
+
+        with self._lock:
+            holder = self._claims.get(key)
+            if holder is not None and holder[1] > time.time():
+                return holder[0]
+            self._claims[key] = (task_id, time.time() + ttl)
+            return task_id
+
+    def release(self, key: str, task_id: str):
+        """Release a claim held by task_id."""
+        if self.client is not None:
+            if self.client.get(self.claim_prefix + key) == task_id.encode():
+                self.client.delete(self.claim_prefix + key)
+            return
+
+        with self._lock:
+            if self._claims.get(key, (None,))[0] == task_id:
+                del self._claims[key]
+
+
+# Global task store instance (forecasting, model training and /task lookups)
+background_tasks_store = TaskStore(Config.REDIS_URL)
+
+
+def get_user_task(task_id: str, user_id: str):
+    """Return a task owned by user_id, or None if it doesn't exist or belongs to someone else."""
+    task = background_tasks_store.get(task_id)
+    if task is None or task.get('user_id') != user_id:
+        return None
+    return task
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the in-process fallback of the response cache.
+"""
+
+import threading
+import time
+import unittest
+import unittest.mock as mock
+
+from cache import ResponseCache, coordinate_key, single_flight, make_etag, etag_matches
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache without a Redis backend."""
+
+    def setUp(self):
+        self.cache = ResponseCache()
+
+    def test_get_returns_stored_value(self):
+        self.cache.set('key', {'values': [1, 2, 3]}, ttl=60)
+        self.assertEqual(self.cache.get('key'), {'values': [1, 2, 3]})
+
+    def test_get_missing_key_returns_none(self):
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_expired_entry_is_evicted(self):
+        with mock.patch('cache.time.time', return_value=1000.0):
+            self.cache.set('key', {'a': 1}, ttl=10)
+        with mock.patch('cache.time.time', return_value=1011.0):
+            self.assertIsNone(self.cache.get('key'))
+        self.assertNotIn('key', self.cache._local)
+
+    def test_cached_value_is_isolated_from_caller_mutation(self):
+        value = {'a': 1}
+        self.cache.set('key', value, ttl=60)
+        value['a'] = 2
+        cached = self.cache.get('key')
+        cached['b'] = 3
+        self.assertEqual(self.cache.get('key'), {'a': 1})
+
+    def test_local_cache_evicts_least_recently_used(self):
+        cache = ResponseCache(max_local_entries=2)
+        cache.set('a', 1, ttl=60)
+        cache.set('b', 2, ttl=60)
+        cache.get('a')
+        cache.set('c', 3, ttl=60)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_delete(self):
+        self.cache.set('key', 1, ttl=60)
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_coordinate_key_rounds_to_three_decimals(self):
+        self.assertEqual(coordinate_key('weather', -1.28641, 36.81723), 'weather:-1.286:36.817')
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for the single_flight decorator."""
+
+    def test_finished_calls_are_not_cached(self):
+        calls = []
+
+        @single_flight
+        def compute(x):
+            calls.append(x)
+            return {'value': x}
+
+        self.assertEqual(compute(1), {'value': 1})
+        self.assertEqual(compute(1), {'value': 1})
+        self.assertEqual(calls, [1, 1])
+
+    def test_concurrent_calls_are_coalesced(self):
+        calls = []
+        started = threading.Event()
+
+        @single_flight
+        def compute(x):
+            calls.append(x)
+            started.set()
+            time.sleep(0.1)
+            return {'value': x}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(compute(5))) for _ in range(4)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [5])
+        self.assertEqual(results, [{'value': 5}] * 4)
+
+    def test_exceptions_reach_waiting_callers(self):
+        started = threading.Event()
+
+        @single_flight
+        def compute():
+            started.set()
+            time.sleep(0.1)
+            raise RuntimeError('upstream failure')
+
+        errors = []
+
+        def call():
+            try:
+                compute()
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, ['upstream failure'] * 3)
+
+
+class TestETag(unittest.TestCase):
+    """Test cases for ETag helpers."""
+
+    def test_make_etag_is_stable_and_quoted(self):
+        etag = make_etag('vis', 'abc', 1, '2024-01-01T00:00:00')
+        self.assertEqual(etag, make_etag('vis', 'abc', 1, '2024-01-01T00:00:00'))
+        self.assertNotEqual(etag, make_etag('vis', 'abc', 1, '2024-01-02T00:00:00'))
+        self.assertTrue(etag.startswith('"') and etag.endswith('"'))
+
+    def test_etag_matches(self):
+        etag = make_etag('evi', 'abc', 10)
+        self.assertTrue(etag_matches(etag, etag))
+        self.assertTrue(etag_matches(f'"other", {etag}', etag))
+        self.assertTrue(etag_matches(f'W/{etag}', etag))
+        self.assertTrue(etag_matches('*', etag))
+        self.assertFalse(etag_matches(None, etag))
+        self.assertFalse(etag_matches('"other"', etag))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the buffered forecast writer.
+"""
+
+import os
+import unittest
+import unittest.mock as mock
+
+os.environ.setdefault('SUPABASE_URL', 'https://example.supabase.co')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+
+with mock.patch('supabase.create_client'):
+    from forecast_writer import ForecastWriter
+    from database import db
+
+
+class TestForecastWriter(unittest.TestCase):
+    """Test cases for ForecastWriter."""
+
+    def test_flush_writes_queued_forecasts_in_one_insert(self):
+        writer = ForecastWriter(flush_interval=60)
+        with mock.patch.object(db, 'save_forecasts_bulk') as bulk:
+            writer.add('user_1', {'type': 'Polygon'}, {'forecast_values': [0.5]})
+            writer.add('user_2', {'type': 'weather'}, {'forecast_values': [21.0]})
+            writer.flush()
+            writer.flush()
+
+        bulk.assert_called_once_with([
+            ('user_1', {'type': 'Polygon'}, {'forecast_values': [0.5]}),
+            ('user_2', {'type': 'weather'}, {'forecast_values': [21.0]})
+        ])
+
+    def test_failed_bulk_insert_is_retried_row_by_row(self):
+        writer = ForecastWriter(flush_interval=60)
+        with mock.patch.object(db, 'save_forecasts_bulk', return_value=None), \
+                mock.patch.object(db, 'save_forecast', side_effect=[mock.MagicMock(), None]) as single:
+            writer.add('user_1', {}, {'forecast_values': [0.5]})
+            writer.add('user_2', {}, {'forecast_values': 'bad'})
+            writer.flush()
+
+        self.assertEqual(single.call_args_list, [
+            mock.call('user_1', {}, {'forecast_values': [0.5]}),
+            mock.call('user_2', {}, {'forecast_values': 'bad'})
+        ])
+
+    def test_full_buffer_is_flushed_by_background_thread(self):
+        writer = ForecastWriter(flush_size=2, flush_interval=60)
+        with mock.patch.object(db, 'save_forecasts_bulk') as bulk:
+            flushed = mock.MagicMock()
+            bulk.side_effect = lambda rows: flushed(rows)
+            writer.add('user_1', {}, {})
+            writer.add('user_2', {}, {})
+            for _ in range(100):
+                if bulk.called:
+                    break
+                writer._thread.join(0.01)
+
+        self.assertEqual(len(bulk.call_args[0][0]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
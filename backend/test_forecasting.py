@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the in-process fitted model cache in forecasting.
+"""
+
+import os
+import unittest
+import unittest.mock as mock
+
+os.environ.setdefault('SUPABASE_URL', 'https://example.supabase.co')
+os.environ.setdefault('SUPABASE_KEY', 'test-key')
+
+with mock.patch('supabase.create_client'):
+    import forecasting
+    from database import db
+
+
+class TestFittedModelCache(unittest.TestCase):
+    """Test cases for reusing fitted models across forecast calls."""
+
+    def setUp(self):
+        forecasting._fitted_models.clear()
+        self.historical = {
+            'dates': [f'2022-{month:02d}-01' for month in range(1, 13)] + [f'2023-{month:02d}-01' for month in range(1, 13)],
+            'values': [0.4 + 0.1 * ((month % 12) / 12) for month in range(24)]
+        }
+
+    def test_repeat_forecast_reuses_fitted_model(self):
+        with mock.patch.object(db, 'get_cached_arima_model', return_value=None) as lookup, \
+             mock.patch.object(db, 'save_cached_arima_model') as save:
+            forecasting.forecast_ndvi(self.historical, periods=6, geometry_hash='abc')
+            forecasting.forecast_ndvi(self.historical, periods=12, geometry_hash='abc')
+
+        self.assertEqual(len(forecasting._fitted_models), 1)
+        self.assertEqual(lookup.call_count, 1)
+        self.assertEqual(save.call_count, 1)
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(forecasting, 'MODEL_CACHE_SIZE', 2):
+            for key in ['a', 'b', 'c']:
+                forecasting.remember_model(key, object(), {})
+        self.assertEqual(list(forecasting._fitted_models), ['b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the per-stage request timers.
+"""
+
+import unittest
+
+import metrics
+from metrics import stage_timer, timed
+
+
+@unittest.skipIf(metrics.STAGE_SECONDS is None, "prometheus_client not installed")
+class TestStageTimers(unittest.TestCase):
+    """Test cases for stage_timer and timed."""
+
+    def _observations(self, endpoint, stage):
+        for metric in metrics.STAGE_SECONDS.collect():
+            for sample in metric.samples:
+                if (sample.name.endswith('_count') and sample.labels.get('endpoint') == endpoint
+                        and sample.labels.get('stage') == stage):
+                    return sample.value
+        return 0
+
+    def test_stage_timer_records_observation(self):
+        before = self._observations('test', 'block')
+        with stage_timer('test', 'block'):
+            pass
+        self.assertEqual(self._observations('test', 'block'), before + 1)
+
+    def test_stage_timer_records_on_exception(self):
+        before = self._observations('test', 'failing')
+        with self.assertRaises(ValueError):
+            with stage_timer('test', 'failing'):
+                raise ValueError('boom')
+        self.assertEqual(self._observations('test', 'failing'), before + 1)
+
+    def test_timed_wraps_function(self):
+        before = self._observations('test', 'func')
+        wrapped = timed('test', 'func', lambda x: x * 2)
+        self.assertEqual(wrapped(21), 42)
+        self.assertEqual(self._observations('test', 'func'), before + 1)
+
+
+@unittest.skipIf(metrics.make_asgi_app is None, "prometheus_client not installed")
+class TestMetricsApp(unittest.TestCase):
+    """Test cases for the token-protected /metrics app."""
+
+    def _client(self, token):
+        from starlette.applications import Starlette
+        from starlette.testclient import TestClient
+
+        app = Starlette()
+        app.mount('/metrics', metrics.metrics_app(token))
+        return TestClient(app)
+
+    def test_not_mounted_without_token(self):
+        self.assertIsNone(metrics.metrics_app(None))
+
+    def test_requires_bearer_token(self):
+        client = self._client('secret')
+        self.assertEqual(client.get('/metrics/').status_code, 401)
+        self.assertEqual(client.get('/metrics/', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+        response = client.get('/metrics/', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('landcare_stage_seconds', response.text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Unit tests for polygon area calculation used by /analyze.
+"""
+
+import unittest
+import unittest.mock as mock
+import os
+
+# Set environment variables for testing
+os.environ.setdefault('SUPABASE_URL', 'test_url')
+os.environ.setdefault('SUPABASE_KEY', 'test_key')
+
+with mock.patch('supabase.create_client', return_value=mock.MagicMock()):
+    import routes.analysis
+    from routes.analysis import calculate_polygon_area
+
+
+class TestPolygonArea(unittest.TestCase):
+    """Test cases for calculate_polygon_area."""
+
+    def test_square_at_equator(self):
+        # 0.01° x 0.01° square: ~1.11 km x 1.11 km = ~123 ha
+        square = [[0, 0], [0.01, 0], [0.01, 0.01], [0, 0.01], [0, 0]]
+        self.assertAlmostEqual(calculate_polygon_area(square) / 10000, 123.2, delta=1.0)
+
+    def test_open_and_closed_rings_match(self):
+        ring = [[36.8, -1.3], [36.82, -1.3], [36.83, -1.28], [36.8, -1.27]]
+        self.assertAlmostEqual(calculate_polygon_area(ring), calculate_polygon_area(ring + [ring[0]]))
+
+    def test_winding_order_does_not_matter(self):
+        ring = [[36.8, -1.3], [36.82, -1.3], [36.83, -1.28], [36.8, -1.27]]
+        self.assertAlmostEqual(calculate_polygon_area(ring), calculate_polygon_area(ring[::-1]))
+
+    def test_planar_fallback_close_to_geodesic_for_small_polygons(self):
+        ring = [[36.8, -1.3], [36.82, -1.3], [36.83, -1.28], [36.8, -1.27]]
+        geodesic = calculate_polygon_area(ring)
+        with mock.patch.object(routes.analysis, '_GEOD', None):
+            planar = calculate_polygon_area(ring)
+        self.assertAlmostEqual(planar / geodesic, 1.0, delta=0.01)
+
+    def test_repeat_polygons_are_cached(self):
+        ring = [[36.9, -1.3], [36.92, -1.3], [36.93, -1.28], [36.9, -1.27]]
+        routes.analysis._polygon_area.cache_clear()
+        first = calculate_polygon_area(ring)
+        second = calculate_polygon_area([list(point) for point in ring])
+        self.assertEqual(first, second)
+        self.assertEqual(routes.analysis._polygon_area.cache_info().hits, 1)
+
+    def test_degenerate_input(self):
+        self.assertEqual(calculate_polygon_area([]), 0)
+        self.assertEqual(calculate_polygon_area([[0, 0], [1, 1]]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
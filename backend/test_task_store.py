@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared background task store.
+"""
+
+import unittest
+import unittest.mock as mock
+
+from task_store import TaskStore
+
+
+class TestTaskStore(unittest.TestCase):
+    """Test cases for TaskStore."""
+
+    def setUp(self):
+        self.store = TaskStore()
+
+    def test_dict_interface(self):
+        self.store['task_1'] = {'status': 'processing'}
+        self.assertIn('task_1', self.store)
+        self.assertEqual(self.store['task_1'], {'status': 'processing'})
+        self.assertEqual(self.store.get('missing'), None)
+        self.assertEqual(len(self.store), 1)
+
+    def test_clear(self):
+        self.store['task_1'] = {'status': 'completed'}
+        self.store['task_2'] = {'status': 'failed'}
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+
+    def test_expired_task_is_evicted(self):
+        with mock.patch('task_store.time.time', return_value=1000.0):
+            self.store['task_1'] = {'status': 'completed'}
+        with mock.patch('task_store.time.time', return_value=1000.0 + self.store.ttl):
+            self.assertIsNone(self.store.get('task_1'))
+            self.assertEqual(len(self.store), 0)
+
+    def test_oldest_tasks_evicted_beyond_maxsize(self):
+        store = TaskStore(maxsize=2)
+        store['task_1'] = {'status': 'completed'}
+        store['task_2'] = {'status': 'completed'}
+        store['task_1'] = {'status': 'failed'}
+        store['task_3'] = {'status': 'processing'}
+        self.assertEqual(sorted(store), ['task_1', 'task_3'])
+
+    def test_claim_returns_running_holder_until_released(self):
+        self.assertEqual(self.store.claim('job', 'task_1'), 'task_1')
+        self.assertEqual(self.store.claim('job', 'task_2'), 'task_1')
+        self.store.release('job', 'task_2')
+        self.assertEqual(self.store.claim('job', 'task_2'), 'task_1')
+        self.store.release('job', 'task_1')
+        self.assertEqual(self.store.claim('job', 'task_2'), 'task_2')
+
+
+class FakeRedis:
+    """Minimal stand-in for the redis client calls TaskStore makes."""
+
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value.encode()
+        self.ttls[key] = ttl
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value.encode()
+        self.ttls[key] = ex
+        return True
+
+    def delete(self, key):
+        return 1 if self.values.pop(key, None) is not None else 0
+
+    def scan_iter(self, match):
+        return [key.encode() for key in self.values if key.startswith(match.rstrip('*'))]
+
+
+class TestRedisTaskStore(unittest.TestCase):
+    """Test cases for TaskStore with a Redis backend."""
+
+    def setUp(self):
+        self.store = TaskStore()
+        self.store.client = FakeRedis()
+
+    def test_tasks_round_trip_through_redis_with_ttl(self):
+        self.store['task_1'] = {'status': 'completed', 'result': {'values': [0.5]}}
+        self.assertEqual(self.store['task_1'], {'status': 'completed', 'result': {'values': [0.5]}})
+        self.assertEqual(self.store.client.ttls['landcare:task:task_1'], self.store.ttl)
+        self.assertEqual(list(self.store), ['task_1'])
+        self.assertEqual(self.store._tasks, {})
+
+    def test_claims_are_kept_apart_from_tasks(self):
+        self.assertEqual(self.store.claim('job', 'task_1'), 'task_1')
+        self.assertEqual(self.store.claim('job', 'task_2'), 'task_1')
+        self.assertEqual(self.store.client.ttls['landcare:claim:job'], 600)
+        self.assertEqual(list(self.store), [])
+        self.store.release('job', 'task_1')
+        self.assertEqual(self.store.claim('job', 'task_2'), 'task_2')
+
+    def test_missing_task(self):
+        self.assertNotIn('missing', self.store)
+        with self.assertRaises(KeyError):
+            del self.store['missing']
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -23,4 +23,185 @@ def test_analyze_without_auth():
             "coordinates": [[[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]]]
         }
     })
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def test_geocode_batch_rejects_empty_list():
+    """Test /geocode/batch endpoint returns 422 for an empty place_names list."""
+    response = client.post("/geocode/batch", json={"place_names": []})
+    assert response.status_code == 422
+
+
+def test_malformed_json_body_rejected():
+    """Test malformed JSON bodies decoded by orjson still return 422."""
+    response = client.post(
+        "/geocode/batch",
+        content=b'{"place_names": [',
+        headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 422
+
+
+def test_oversized_request_body_rejected():
+    """Test requests larger than the configured body limit return 413."""
+    response = client.post(
+        "/geocode",
+        content=b"x" * (2 * 1024 * 1024),
+        headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+
+def test_oversized_chunked_request_body_rejected():
+    """Test bodies streamed without Content-Length are still capped."""
+    response = client.post(
+        "/geocode",
+        content=iter([b"x" * (512 * 1024)] * 4),
+        headers={"Content-Type": "application/json"}
+    )
+    assert response.status_code == 413
+
+
+def test_historical_index_rejects_oversized_geometry(as_user_1):
+    """Test /historical/evi validates the geometry's vertex count."""
+    from models.schemas import MAX_GEOMETRY_VERTICES
+
+    ring = [[0.0, 0.0]] * (MAX_GEOMETRY_VERTICES + 1)
+    response = client.post("/historical/evi", json={"type": "Polygon", "coordinates": [ring]})
+    assert response.status_code == 422
+
+
+def test_verified_token_skips_repeat_user_lookup():
+    """Test a verified token is served from the auth cache on the next request."""
+    import asyncio
+    from unittest import mock
+    from fastapi.security import HTTPAuthorizationCredentials
+    from auth.dependencies import create_access_token, get_current_user
+
+    token = create_access_token({"user_id": "cache-test-user", "email": "cache@example.com"})
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    with mock.patch("auth.dependencies.db.get_user_by_id", return_value={"id": "cache-test-user"}) as lookup:
+        first = asyncio.run(get_current_user(credentials))
+        second = asyncio.run(get_current_user(credentials))
+    assert first == second == {"user_id": "cache-test-user", "email": "cache@example.com"}
+    assert lookup.call_count == 1
+
+
+@pytest.fixture
+def as_user_1():
+    """Authenticate requests as user-1 for the duration of a test."""
+    from auth.dependencies import get_current_user
+
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "user-1", "email": "user1@example.com"}
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+
+def test_history_is_paginated(as_user_1):
+    """Test /history pushes limit, offset and fields into the database reads."""
+    from unittest import mock
+
+    page = mock.MagicMock(data=[{"id": 1}])
+    with mock.patch("routes.tasks.db.get_forecasts", return_value=page) as forecasts:
+        response = client.get("/history/user-1?type=forecasts&limit=20&offset=40&fields=id,created_at")
+    assert response.status_code == 200
+    assert response.json() == {"forecasts": [{"id": 1}], "next_offset": 60}
+    forecasts.assert_called_once_with("user-1", 20, 40, "id,created_at")
+
+    assert client.get("/history/user-1?fields=id;drop").status_code == 400
+
+
+def test_history_not_modified_when_versions_unchanged(as_user_1):
+    """Test /history answers 304 for a matching ETag while the history versions are unchanged."""
+    from unittest import mock
+
+    page = mock.MagicMock(data=[])
+    with mock.patch("routes.tasks.history_versions", return_value=[1, 0, 2]), \
+            mock.patch("routes.tasks.db.get_forecasts", return_value=page) as forecasts:
+        first = client.get("/history/user-1?type=forecasts")
+        etag = first.headers["etag"]
+        second = client.get("/history/user-1?type=forecasts", headers={"If-None-Match": etag})
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert forecasts.call_count == 1
+
+
+def test_geocode_misses_are_cached_under_normalized_names():
+    """Test unknown places are looked up once, whatever their case and spacing."""
+    from unittest import mock
+
+    with mock.patch("routes.utility.perform_geocode", side_effect=Exception("Location not found")) as lookup:
+        first = client.post("/geocode", json={"place_name": "Nowhere  Town"})
+        second = client.post("/geocode/batch", json={"place_names": [" nowhere town"]})
+    assert first.status_code == 500
+    assert second.json()["results"][0]["error"] == "Location not found"
+    assert lookup.call_count == 1
+
+
+def test_history_of_another_user_is_forbidden(as_user_1):
+    """Test /history refuses to return a different user's rows."""
+    from unittest import mock
+
+    with mock.patch("routes.tasks.db.get_forecasts") as forecasts:
+        response = client.get("/history/user-2?type=forecasts")
+    assert response.status_code == 403
+    forecasts.assert_not_called()
+
+
+def test_history_requires_authentication():
+    """Test /history rejects requests without a token."""
+    assert client.get("/history/user-1").status_code in (401, 403)
+
+
+def test_history_reports_failed_sections(as_user_1):
+    """Test a failed history query shows up as <section>_error instead of disappearing."""
+    from unittest import mock
+
+    with mock.patch("routes.tasks.db.get_forecasts", return_value=None):
+        response = client.get("/history/user-1?type=forecasts")
+    assert response.json() == {"forecasts_error": "History query failed", "next_offset": 100}
+
+
+def test_partial_history_gets_no_etag(as_user_1):
+    """Test a response with a failed section is marked no-store and carries no ETag."""
+    from unittest import mock
+
+    with mock.patch("routes.tasks.history_versions", return_value=[1, 0, 2]), \
+            mock.patch("routes.tasks.db.get_forecasts", return_value=None):
+        response = client.get("/history/user-1?type=forecasts")
+    assert response.status_code == 200
+    assert "etag" not in response.headers
+    assert response.headers["cache-control"] == "no-store"
+
+
+def test_cached_forecast_is_still_saved_to_history(as_user_1):
+    """Test a forecast served from the cache is still recorded for the requesting user."""
+    from unittest import mock
+
+    body = {"historical_ndvi": {"dates": ["2024-01-01", "2024-02-01"], "values": [0.11, 0.37]}, "months": 3}
+    with mock.patch("forecasting.forecast_ndvi", return_value={"forecast_values": [0.4]}) as fit, \
+            mock.patch("routes.forecasting.forecast_writer") as writer:
+        client.post("/api/forecast/vis", json=body)
+        response = client.post("/api/forecast/vis", json=body)
+    assert response.json()["cached"] is True
+    assert fit.call_count == 1
+    assert [call.args[0] for call in writer.add.call_args_list] == ["user-1", "user-1"]
+
+
+def test_task_status_is_scoped_to_owner(as_user_1):
+    """Test /task/{task_id} only returns tasks that belong to the current user."""
+    from task_store import background_tasks_store
+
+    background_tasks_store["task-own"] = {"status": "pending", "user_id": "user-1"}
+    background_tasks_store["task-other"] = {"status": "pending", "user_id": "user-2"}
+    try:
+        assert client.get("/task/task-own").json()["status"] == "pending"
+        assert client.get("/task/task-other").status_code == 404
+    finally:
+        del background_tasks_store["task-own"]
+        del background_tasks_store["task-other"]
+
+
+def test_task_status_requires_auth():
+    """Test /task/{task_id} rejects unauthenticated requests."""
+    response = client.get("/task/anything")
+    assert response.status_code in (401, 403)
@@ -1,9 +1,16 @@
 import requests
+from requests.adapters import HTTPAdapter
 from config.config import Config
+from cache import single_flight
 from datetime import datetime, timedelta, timezone
 import ee
 import numpy as np
 
+# Shared session so Open-Meteo calls reuse pooled keep-alive connections.
+# Retries stay in the per-call loops below.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=50))
+
 def get_weather_data(lat, lon):
     """Get comprehensive weather data from Open-Meteo API."""
     try:
@@ -20,7 +27,7 @@ def get_weather_data(lat, lon):
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, timeout=10)
+                response = SESSION.get(url, timeout=10)
                 response.raise_for_status()
                 data = response.json()
                 break
@@ -56,7 +63,7 @@ def get_weather_forecast(lat, lon, api_key=None):
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, timeout=10)
+                response = SESSION.get(url, timeout=10)
                 response.raise_for_status()
                 data = response.json()
                 break
@@ -390,7 +397,7 @@ def _get_historical_weather_single_request(lat, lon, start_date, end_date):
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                response = requests.get(url, timeout=30)
+                response = SESSION.get(url, timeout=30)
                 response.raise_for_status()
                 data = response.json()
                 break
@@ -408,6 +415,7 @@ def _get_historical_weather_single_request(lat, lon, start_date, end_date):
         # Return mock data on error
         return _generate_mock_historical_data(start_date, end_date, error=str(e))
 
+@single_flight
 def get_historical_weather(lat, lon, start_date=None, end_date=None, api_key=None):
     """Get historical weather data using Open-Meteo Archive API with chunked requests for long ranges."""
     try:
@@ -435,7 +443,8 @@ def get_historical_weather(lat, lon, start_date=None, end_date=None, api_key=Non
         all_data = []
         current_start = start_date
 
-        while current_start < end_date:
+        # Inclusive: an end date on January 1st is its own one-day chunk
+        while current_start <= end_date:
             # Calculate end of current year chunk
             current_year_end = datetime(current_start.year, 12, 31)
             chunk_end = min(current_year_end, end_date)
@@ -452,7 +461,7 @@ def get_historical_weather(lat, lon, start_date=None, end_date=None, api_key=Non
             current_start = chunk_end + timedelta(days=1)
 
             # Add delay between requests to handle rate limits (1 second)
-            if current_start < end_date:
+            if current_start <= end_date:
                 import time
                 time.sleep(1)
 
@@ -78,6 +78,10 @@ CREATE INDEX IF NOT EXISTS idx_landcare_analyses_created_at ON landcare_analyses
 CREATE INDEX IF NOT EXISTS idx_landcare_historical_data_user_id ON landcare_historical_data(user_id);
 CREATE INDEX IF NOT EXISTS idx_landcare_historical_data_type ON landcare_historical_data(data_type);
 CREATE INDEX IF NOT EXISTS idx_landcare_forecasts_user_id ON landcare_forecasts(user_id);
+-- Composite indexes serve the paginated, newest-first history reads
+CREATE INDEX IF NOT EXISTS idx_landcare_analyses_user_created ON landcare_analyses(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_landcare_historical_data_user_type_created ON landcare_historical_data(user_id, data_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_landcare_forecasts_user_created ON landcare_forecasts(user_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_landcare_cached_historical_data_hash ON landcare_cached_historical_data(geometry_hash);
 CREATE INDEX IF NOT EXISTS idx_landcare_cached_models_key ON landcare_cached_models(model_key);
 